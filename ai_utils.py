@@ -1,26 +1,189 @@
+import hashlib
 import logging
-import requests
+import mmap
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
 import time
+import requests
 import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from checksum_utils import calculate_checksum, calculate_checksum_from_bytes
+from json_utils import json_dumps, json_loads
+from file_utils import SINGLE_READ_MAX_BYTES, TXT_MMAP_THRESHOLD
+
+# (connect, read) timeouts in seconds; long completions can take minutes
+REQUEST_TIMEOUT = (10, 300)
+MAX_RETRIES = 5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Consecutive batch status checks that may fail (each after its own retries)
+# before a running batch is given up on
+MAX_FAILED_POLLS = 10
+
+def _create_session():
+    """Create an HTTP session that keeps a pool of connections to the API alive."""
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+# Shared across calls so keep-alive connections to the API are reused
+_SESSION = _create_session()
+
+def _backoff_delay(attempt, initial=1, maximum=30):
+    """Exponential backoff with jitter: ~1s, 2s, 4s... capped at maximum."""
+    return min(maximum, initial * 2 ** attempt) + random.uniform(0, 1)
+
+def _request_with_retries(method, url, headers, **kwargs):
+    """Send a request to the API, retrying only transient failures.
 
-def extract_text_from_pdf(file_path):
-    text = ''
+    Timeouts, connection errors and 429/5xx responses are retried up to
+    MAX_RETRIES times with exponential backoff, honouring Retry-After on
+    rate-limited responses. Successful calls never sleep.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = _SESSION.request(method, url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = _backoff_delay(attempt)
+            logging.warning(f"Request to OpenAI API failed ({e}), retrying in {delay:.1f}s")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                return response
+            delay = _backoff_delay(attempt)
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    delay = float(retry_after)
+                except ValueError:
+                    pass
+            logging.warning(f"OpenAI API returned {response.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+def _post_with_retries(url, headers, data, files=None):
+    """POST to the API with _request_with_retries.
+
+    data is sent as JSON, or with files set, as form fields alongside a
+    multipart upload.
+    """
+    if files is not None:
+        return _request_with_retries('POST', url, headers, data=data, files=files)
+    return _request_with_retries('POST', url, headers, json=data)
+
+# Below this many pages, spawning worker processes costs more than it saves
+PARALLEL_PDF_PAGE_THRESHOLD = 50
+
+def _extract_pdf_page_range(file_path, start, stop):
+    # Plain "text" mode skips layout analysis we don't need for LLM input, and
+    # joining once avoids quadratic string concatenation on long documents
     with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
-
-def extract_text(file_path):
-    file_type = file_path.split('.')[-1].lower()
-    if file_type == 'pdf':
-        return extract_text_from_pdf(file_path)
-    elif file_type == 'txt':
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    else:
-        return None
-
-def query_openai_gptX_with_schema(text, questions, role_prompt, model_name, api_key, file_path=None, function_schema=None, max_tokens=2000, temperature=0.3):
+        return ''.join(doc.load_page(i).get_text("text") for i in range(start, stop))
+
+_PDF_POOL = None
+_PDF_POOL_LOCK = threading.Lock()
+
+def _pdf_pool():
+    """Process pool shared by every large-PDF extraction, created on first use.
+
+    Callers run on several AI worker threads at once, so one bounded pool
+    keeps the process count at the CPU count. Workers are spawned rather
+    than forked, since forking a multithreaded process can copy held locks.
+    """
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            _PDF_POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
+        return _PDF_POOL
+
+def extract_text_from_pdf(file_path, data=None):
+    """Extract text from a PDF, optionally from contents already in memory."""
+    with (fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(file_path)) as doc:
+        page_count = doc.page_count
+        if page_count < PARALLEL_PDF_PAGE_THRESHOLD:
+            return ''.join(page.get_text("text") for page in doc)
+
+    # PyMuPDF documents can't be shared between threads, so split large files
+    # into contiguous page ranges and let each worker process open its own copy
+    workers = min(os.cpu_count() or 1, page_count)
+    step = -(-page_count // workers)
+    starts = list(range(0, page_count, step))
+    stops = [min(start + step, page_count) for start in starts]
+    parts = _pdf_pool().map(_extract_pdf_page_range, [file_path] * len(starts), starts, stops)
+    return ''.join(parts)
+
+def read_file_with_checksum(file_path):
+    """Read a file once, returning (checksum, contents).
+
+    contents is None when the file is too large to hold in memory, in which
+    case callers should extract text from the path instead.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > SINGLE_READ_MAX_BYTES:
+            return calculate_checksum(file_path), None
+        data = f.read()
+    return calculate_checksum_from_bytes(data), data
+
+def extract_text_from_txt(file_path, data=None):
+    if data is None:
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size >= TXT_MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return str(mm, 'utf-8')
+            data = f.read()
+    return data.decode('utf-8')
+
+# Extractors by lower-cased file extension
+TEXT_EXTRACTORS = {
+    '.pdf': extract_text_from_pdf,
+    '.txt': extract_text_from_txt,
+}
+
+def extract_text(file_path, data=None):
+    """Extract text from a supported file, or return None for other types."""
+    extractor = TEXT_EXTRACTORS.get(os.path.splitext(file_path)[1].lower())
+    return extractor(file_path, data) if extractor else None
+
+def _build_base_request(model_name, function_schema, max_tokens, temperature):
+    """Build the request fields that are the same for every question."""
+    data = {
+        "model": model_name,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    if function_schema:
+        data["functions"] = [function_schema]
+    return data
+
+def _build_chat_request(base_request, prompt_prefix, question):
+    # The role prompt and document text form a fixed prefix shared by every
+    # question, so the API's prompt caching can reuse it across requests
+    prompt = f"{prompt_prefix}\n\n###\n\n{question}\nAnswer:"
+    return {**base_request, "messages": [{"role": "user", "content": prompt}]}
+
+def _parse_chat_response(response_data, function_schema):
+    message = response_data['choices'][0]['message']
+    if function_schema:
+        return message['function_call']['arguments']
+    return message['content']
+
+def _response_cache_path(cache_dir, text, file_checksum, questions, role_prompt, base_request):
+    """Path of the cached responses for one exact set of inputs and settings."""
+    key_data = json_dumps({
+        "text": hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        "file": file_checksum,
+        "questions": list(questions),
+        "role_prompt": role_prompt,
+        "request": base_request
+    })
+    return os.path.join(cache_dir, f"{hashlib.sha256(key_data.encode('utf-8')).hexdigest()}.json")
+
+def query_openai_gptX_with_schema(text, questions, role_prompt, model_name, api_key, file_path=None, function_schema=None, max_tokens=2000, temperature=0.3, max_concurrent_requests=5, response_cache_dir=None):
+    text = text or ''
     logging.info(f"Starting query_openai_gptX_with_schema function with text: {text[:80]}...")
     logging.info(f"Questions: {questions[:80]}...")
     logging.info(f"Role prompt: {role_prompt[:80]}...")
@@ -35,51 +198,199 @@ def query_openai_gptX_with_schema(text, questions, role_prompt, model_name, api_
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    responses = {}
+
+    base_request = _build_base_request(model_name, function_schema, max_tokens, temperature)
+
+    # Identical inputs (same text or unchanged file, questions and settings)
+    # reuse answers saved by an earlier run instead of re-extracting and
+    # re-querying the API
+    cache_path = None
+    file_data = None
+    if response_cache_dir:
+        # Hashing and extraction share a single read of the file
+        file_checksum, file_data = read_file_with_checksum(file_path) if file_path else (None, None)
+        cache_path = _response_cache_path(response_cache_dir, text, file_checksum, questions, role_prompt, base_request)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    logging.info(f"Using cached responses from {cache_path}")
+                    return json_loads(f.read())
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable response cache {cache_path}: {e}")
 
     if file_path:
         logging.info(f"Processing file input from {file_path}.")
-        extracted_text = extract_text(file_path)
+        extracted_text = extract_text(file_path, file_data)
         if extracted_text is None:
             logging.error("Unsupported file type. Only PDF and TXT files are supported.")
             return {"error": "Unsupported file type. Only PDF and TXT files are supported."}
         text += "\n" + extracted_text
         logging.info("Text extracted and appended to main text.")
 
-    for question in questions:
-        logging.info(f"Preparing to submit question: {question}")
-        prompt = f"{role_prompt}\n{text}\n\n###\n\n{question}\nAnswer:"
-        data = {
-            "model": model_name,
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
+    prompt_prefix = f"{role_prompt}\n{text}"
 
-        if function_schema:
-            data["functions"] = [function_schema]
+    def submit_question(question):
+        logging.info(f"Preparing to submit question: {question}")
+        data = _build_chat_request(base_request, prompt_prefix, question)
 
         try:
             logging.info("Sending request to OpenAI API.")
-            response = requests.post(url, headers=headers, json=data)
+            response = _post_with_retries(url, headers, data)
             response_data = response.json()
 
             if response.ok:
                 logging.info("Received successful response from OpenAI API.")
-                if function_schema:
-                    responses[question] = response_data['choices'][0]['message']['function_call']['arguments']
-                else:
-                    responses[question] = response_data['choices'][0]['message']['content']
-            else:
-                logging.error(f"API request failed with status code {response.status_code}: {response.text}")
-                responses[question] = f"API request failed with status code {response.status_code}: {response.text}"
+                return _parse_chat_response(response_data, function_schema), True
+            logging.error(f"API request failed with status code {response.status_code}: {response.text}")
+            return f"API request failed with status code {response.status_code}: {response.text}", False
 
         except requests.RequestException as e:
             logging.error(f"Request to OpenAI API failed: {e}")
-            responses[question] = f"API request failed with error: {str(e)}"
+            return f"API request failed with error: {str(e)}", False
 
-        # Add a delay to see if the function pauses as expected
-        time.sleep(0.5)
+    # Questions are independent and the calls are latency-bound, so submit them
+    # concurrently (bounded to stay within API rate limits) and keep the answers
+    # in question order.
+    max_workers = max(1, min(max_concurrent_requests, len(questions)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(submit_question, questions))
+    responses = {question: answer for question, (answer, _) in zip(questions, results)}
+
+    # Only complete, successful answer sets are worth reusing
+    if cache_path and all(ok for _, ok in results):
+        # Duplicate documents can be analyzed at the same time, so each writer
+        # gets its own temp file; whichever replace lands last wins, and both
+        # hold the same answers. Failing to cache never fails the query.
+        temp_path = None
+        try:
+            os.makedirs(response_cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=response_cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(json_dumps(responses))
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Could not write response cache {cache_path}: {e}")
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
 
     logging.info("Completed processing all questions.")
     return responses
+
+def submit_batch(records_and_questions, role_prompt, model_name, api_key, function_schema=None, max_tokens=2000, temperature=0.3, poll_interval=30):
+    """Answer questions for many documents in one OpenAI Batch API job.
+
+    Batch jobs are billed at half the synchronous rate but complete
+    asynchronously (within 24h), so this is meant for non-interactive runs.
+
+    Args:
+        records_and_questions: Iterable of (record_id, text, questions) tuples
+        poll_interval: Seconds to wait between batch status checks
+
+    Returns:
+        Dict mapping each record_id (as a string) to a {question: answer} dict,
+        the same shape query_openai_gptX_with_schema returns. Only records
+        whose questions were all answered are included, so callers can send
+        the rest through the synchronous API.
+    """
+    base_url = "https://api.openai.com/v1"
+    headers = {"Authorization": f"Bearer {api_key}"}
+    questions_by_id = {}
+
+    base_request = _build_base_request(model_name, function_schema, max_tokens, temperature)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as batch_file:
+        batch_path = batch_file.name
+        for record_id, text, questions in records_and_questions:
+            record_id = str(record_id)
+            questions_by_id[record_id] = list(questions)
+            prompt_prefix = f"{role_prompt}\n{text}"
+            for qidx, question in enumerate(questions):
+                line = {
+                    "custom_id": f"{record_id}:{qidx}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": _build_chat_request(base_request, prompt_prefix, question)
+                }
+                batch_file.write(json_dumps(line) + "\n")
+
+    if not questions_by_id:
+        os.unlink(batch_path)
+        return {}
+
+    try:
+        logging.info(f"Uploading batch input for {len(questions_by_id)} records")
+        with open(batch_path, 'rb') as f:
+            batch_input = f.read()
+        # Sent as bytes so a retried upload resends the whole file
+        upload = _post_with_retries(f"{base_url}/files", headers, {"purpose": "batch"}, files={"file": (os.path.basename(batch_path), batch_input)})
+        upload.raise_for_status()
+
+        batch = _post_with_retries(f"{base_url}/batches", headers, {
+            "input_file_id": upload.json()['id'],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        })
+        batch.raise_for_status()
+        batch_data = batch.json()
+        logging.info(f"Created batch {batch_data['id']}")
+
+        # The batch keeps running (and being billed) while we wait, so a failed
+        # status check is retried at the next poll rather than abandoning it
+        failed_polls = 0
+        while batch_data['status'] not in ('completed', 'failed', 'expired', 'cancelled'):
+            time.sleep(poll_interval)
+            try:
+                status = _request_with_retries('GET', f"{base_url}/batches/{batch_data['id']}", headers)
+                status.raise_for_status()
+            except requests.RequestException as e:
+                failed_polls += 1
+                if failed_polls >= MAX_FAILED_POLLS:
+                    raise
+                logging.warning(f"Checking batch {batch_data['id']} failed ({e}), will check again in {poll_interval}s")
+                continue
+            failed_polls = 0
+            batch_data = status.json()
+            logging.info(f"Batch {batch_data['id']} status: {batch_data['status']}")
+
+        if batch_data['status'] != 'completed' or not batch_data.get('output_file_id'):
+            logging.warning(f"Batch {batch_data['id']} finished with status {batch_data['status']}; falling back to synchronous requests")
+            return {}
+
+        output = _request_with_retries('GET', f"{base_url}/files/{batch_data['output_file_id']}/content", headers)
+        output.raise_for_status()
+    except requests.RequestException as e:
+        logging.warning(f"Batch request to OpenAI API failed ({e}); falling back to synchronous requests")
+        return {}
+    finally:
+        os.unlink(batch_path)
+
+    answers = {}
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        # One bad line only costs the request it belongs to
+        try:
+            result = json_loads(line)
+            custom_id = result['custom_id']
+            record_id, qidx = custom_id.rsplit(':', 1)
+            question = questions_by_id[record_id][int(qidx)]
+            response = result.get('response') or {}
+            if response.get('status_code') != 200:
+                logging.warning(f"Batch request {custom_id} failed: {result.get('error') or response}")
+                continue
+            answers.setdefault(record_id, {})[question] = _parse_chat_response(response['body'], function_schema)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logging.warning(f"Ignoring malformed batch output line ({e}): {line[:200]}")
+
+    responses = {
+        record_id: answers[record_id]
+        for record_id, questions in questions_by_id.items()
+        if len(answers.get(record_id, {})) == len(set(questions))
+    }
+    if len(responses) < len(questions_by_id):
+        logging.warning(f"Batch answered {len(responses)} of {len(questions_by_id)} records; the rest will be sent synchronously")
+    logging.info("Completed processing batch.")
+    return responses
@@ -1,27 +1,232 @@
+import os
 import json
+import mmap
+import struct
 import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from json_utils import json_dumps, json_loads
+from file_utils import atomic_open
 
-def calculate_checksum(file_path):
-    """Calculate SHA-256 checksum of a file."""
-    sha256_hash = hashlib.sha256()
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+CHUNK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 10 * 1024 * 1024
+
+# Checksums are stored as "<algorithm>:<hexdigest>" so entries written by a
+# different algorithm (including older bare SHA-256 digests) can be told apart
+CHECKSUM_ALGORITHM = 'blake3' if blake3 is not None else 'sha256'
+
+def _sha256_hexdigest(file_path):
+    """Calculate the bare SHA-256 hex digest of a file."""
     with open(file_path, "rb") as f:
-        # Read the file in chunks to handle large files efficiently
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+        # Large scans are hashed straight from the page cache via mmap
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return hashlib.sha256(mm).hexdigest()
+            except (OSError, ValueError) as e:
+                logging.debug(f"Falling back to buffered read for {file_path}: {e}")
+                f.seek(0)
+        # Hint the kernel to read ahead aggressively for the sequential scan
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        # Python 3.11+ runs the whole read/update loop in C
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        # Read into one reusable buffer so no new bytes object is allocated per chunk
+        sha256_hash = hashlib.sha256()
+        buf = bytearray(CHUNK_SIZE)
+        view = memoryview(buf)
+        while n := f.readinto(buf):
+            sha256_hash.update(view[:n])
     return sha256_hash.hexdigest()
 
+def _prefix_checksum(file_path, max_bytes):
+    """Hash the first max_bytes of a file together with its size and mtime."""
+    with open(file_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size <= max_bytes:
+            return None
+        head = f.read(max_bytes)
+    hasher = blake3.blake3() if CHECKSUM_ALGORITHM == 'blake3' else hashlib.sha256()
+    hasher.update(head)
+    hasher.update(struct.pack('<qq', st.st_size, st.st_mtime_ns))
+    return f"{CHECKSUM_ALGORITHM}-head{max_bytes}:{hasher.hexdigest()}"
+
+def calculate_checksum(file_path, max_bytes=0):
+    """Calculate the checksum of a file, prefixed with the algorithm used.
+
+    Checksums are only used for change detection, so the faster BLAKE3 is
+    preferred when installed, with SHA-256 as the fallback. With max_bytes set,
+    files larger than that are identified by their first max_bytes plus size
+    and modification time instead of being hashed in full.
+    """
+    if max_bytes:
+        checksum = _prefix_checksum(file_path, max_bytes)
+        if checksum is not None:
+            return checksum
+    if CHECKSUM_ALGORITHM == 'blake3':
+        hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        hasher.update_mmap(file_path)
+        return f"blake3:{hasher.hexdigest()}"
+    return f"sha256:{_sha256_hexdigest(file_path)}"
+
+def calculate_checksum_from_bytes(data):
+    """Calculate the checksum of file contents that are already in memory.
+
+    Produces the same value as calculate_checksum on the file they came from.
+    """
+    if CHECKSUM_ALGORITHM == 'blake3':
+        return f"blake3:{blake3.blake3(data, max_threads=blake3.blake3.AUTO).hexdigest()}"
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+def file_stat_key(file_path):
+    """Key identifying a file's current version by path, size and modification time."""
+    st = os.stat(file_path)
+    return (file_path, st.st_size, st.st_mtime_ns)
+
+def load_checksum_index(index_file, max_bytes=0):
+    """Load the file_stat_key -> checksum index written by save_checksum_index.
+
+    An index written with another algorithm or checksum_prefix_bytes setting
+    holds checksums of a different kind, so it is ignored.
+    """
+    try:
+        with open(index_file, 'rb') as f:
+            saved = json_loads(f.read())
+        if saved['algorithm'] != CHECKSUM_ALGORITHM or saved['max_bytes'] != max_bytes:
+            return {}
+        return {(path, size, mtime_ns): checksum for path, size, mtime_ns, checksum in saved['files']}
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Ignoring unreadable checksum index {index_file}: {e}")
+        return {}
+
+def save_checksum_index(index_file, index, max_bytes=0):
+    """Save a file_stat_key -> checksum index for the next run."""
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    with atomic_open(index_file, 'w', encoding='utf-8') as f:
+        f.write(json_dumps({
+            'algorithm': CHECKSUM_ALGORITHM,
+            'max_bytes': max_bytes,
+            'files': [[*key, checksum] for key, checksum in index.items()]
+        }))
+
+def calculate_checksums_bulk(file_paths, max_workers=None, known=None, max_bytes=0):
+    """Calculate checksums for many files concurrently.
+
+    Hashing releases the GIL, so a thread pool overlaps disk reads and hashes
+    on multiple cores. Files whose path, size and modification time match an
+    entry in known (see load_checksum_index) reuse its checksum without being
+    read at all. max_bytes is passed on to calculate_checksum.
+
+    Returns (checksums, index): a dict mapping each path to its checksum, and
+    the file_stat_key -> checksum index of these files to save for next time.
+    """
+    file_paths = list(file_paths)
+    if not file_paths:
+        return {}, {}
+    known = known or {}
+
+    def checksum(file_path):
+        key = file_stat_key(file_path)
+        return key, known.get(key) or calculate_checksum(file_path, max_bytes)
+
+    max_workers = max_workers or min(16, (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(checksum, file_paths))
+    checksums = {file_path: checksum for file_path, (_, checksum) in zip(file_paths, results)}
+    return checksums, dict(results)
+
+def _is_legacy_key(key):
+    """Whether a processed-file key was recorded with another checksum algorithm."""
+    return not key.split(':', 1)[0].startswith(CHECKSUM_ALGORITHM)
+
+def migrate_legacy_checksum(checksums, file_path, checksum):
+    """Re-key a processed-file entry that was recorded with SHA-256.
+
+    Older runs stored bare SHA-256 digests. When the current checksum isn't
+    known yet but legacy entries exist, hash the file once with SHA-256 and
+    move any matching entry under the new key.
+    """
+    if checksum in checksums:
+        return
+    if not any(map(_is_legacy_key, checksums)):
+        return
+    if checksum.startswith('sha256:'):
+        legacy_digest = checksum.split(':', 1)[1]
+    else:
+        legacy_digest = _sha256_hexdigest(file_path)
+    for legacy_key in (legacy_digest, f"sha256:{legacy_digest}"):
+        if legacy_key in checksums:
+            checksums[checksum] = checksums.pop(legacy_key)
+            logging.info(f"Migrated legacy checksum for {file_path}")
+            return
+
+def _checksum_log_path(checksums_file):
+    """Append-only log kept next to the checksums file."""
+    return f"{os.path.splitext(checksums_file)[0]}.jsonl"
+
+def prune_legacy_checksums(checksums):
+    """Drop legacy entries that no scanned file was migrated to.
+
+    Call once every scanned file has been through migrate_legacy_checksum.
+    While any legacy key remains, each file with an unknown checksum costs an
+    extra SHA-256 pass, so unmatched ones are not kept around for later runs.
+    """
+    stale = [key for key in checksums if _is_legacy_key(key)]
+    for key in stale:
+        del checksums[key]
+    if stale:
+        logging.info(f"Dropped {len(stale)} legacy checksums that match no scanned file")
+    return len(stale)
+
 def load_processed_checksums(checksums_file):
-    """Load previously processed file checksums."""
+    """Load previously processed file checksums.
+
+    Entries appended to the log since the last save are folded in on top,
+    with the latest line for a checksum winning.
+    """
     try:
-        with open(checksums_file, 'r') as f:
-            return json.load(f)
+        with open(checksums_file, 'rb') as f:
+            checksums = json_loads(f.read())
     except (FileNotFoundError, json.JSONDecodeError):
         logging.info("No existing checksums file found, starting fresh")
-        return {}
+        checksums = {}
+    try:
+        with open(_checksum_log_path(checksums_file), 'rb') as f:
+            for line in f:
+                try:
+                    checksums.update(json_loads(line))
+                except (json.JSONDecodeError, ValueError):
+                    # A run interrupted mid-write can leave a partial last line
+                    logging.warning(f"Ignoring malformed line in checksum log: {line[:80]!r}")
+    except FileNotFoundError:
+        pass
+    return checksums
+
+def append_processed_checksum(checksums_file, checksum, entry):
+    """Record one processed file by appending a line to the checksum log.
+
+    Cheaper than rewriting the whole checksums file after every file;
+    save_processed_checksums folds the log back into it.
+    """
+    with open(_checksum_log_path(checksums_file), 'a', encoding='utf-8') as f:
+        f.write(json_dumps({checksum: entry}) + '\n')
 
 def save_processed_checksums(checksums_file, checksums):
-    """Save processed file checksums."""
-    with open(checksums_file, 'w') as f:
-        json.dump(checksums, f, indent=2)
+    """Save processed file checksums and clear the checksum log."""
+    # Written atomically so an interrupted run can't leave a truncated file
+    with atomic_open(checksums_file, 'w', encoding='utf-8') as f:
+        f.write(json_dumps(checksums, indent=True))
+    # Everything in the log is now in the checksums file
+    try:
+        os.remove(_checksum_log_path(checksums_file))
+    except FileNotFoundError:
+        pass
     logging.info(f"Saved {len(checksums)} checksums to {checksums_file}")
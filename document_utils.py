@@ -1,11 +1,156 @@
-import pandas as pd
+import copy
+import csv
+import io
 import logging
+import math
 import os
-import json
 import shutil
+import tarfile
 import yaml
-from template_manager import TemplateManager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from operator import itemgetter
+from html import escape
+from string import Template
+from template_manager import TemplateManager, substitute
 from translation_manager import TranslationManager
+from json_utils import json_dumps
+from file_utils import atomic_open, write_zstd_copy
+
+# Resolved once at import rather than on every call
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(MODULE_DIR, 'config', 'config.yaml')
+TEMPLATES_DIR = os.path.join(MODULE_DIR, 'templates')
+TRANSLATIONS_DIR = os.path.join(MODULE_DIR, 'translations')
+HTML_ASSETS_DIR = os.path.join(MODULE_DIR, 'html')
+# Detail pages location, relative to the output directory
+DETAIL_PAGES_SUBDIR = os.path.join('html', 'details')
+DETAIL_PAGE_ASSETS = ['detail.css', 'print.svg']
+# Detail pages are mostly blocking file I/O, so use several threads per core
+DETAIL_PAGE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Items serialized per write when streaming long lists into the page
+WRITE_BATCH_SIZE = 1000
+
+# Record fields shown in the record table, in display order
+TABLE_FIELDS = (
+    'treatment_date', 'ai_treatment_date', 'visit_type', 'provider_name',
+    'provider_facility', 'primary_condition', 'diagnoses', 'treatments',
+    'medications', 'test_results', 'summary', 'last_processed'
+)
+# Detail pages also show the raw extracted text
+DETAIL_FIELDS = TABLE_FIELDS + ('text',)
+# Escaped columns built per record, and the subset embedded in the main page
+COLUMN_FIELDS = ('new_filename',) + DETAIL_FIELDS
+PAGE_COLUMN_FIELDS = ('new_filename',) + TABLE_FIELDS
+# Fields that are (almost) always distinct per record and not worth memoizing
+UNIQUE_FIELDS = ('new_filename', 'text')
+
+@lru_cache(maxsize=16)
+def _load_config_cached(config_path, mtime_ns, size):
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f)
+
+def _load_config(config_path):
+    """Load a YAML config, parsing it again only when the file changes.
+
+    Returns a copy, so callers can't modify the cached config.
+    """
+    st = os.stat(config_path)
+    return copy.deepcopy(_load_config_cached(config_path, st.st_mtime_ns, st.st_size))
+
+def script_json(obj):
+    """Serialize obj as JSON that is safe to embed inside a <script> block."""
+    return (json_dumps(obj)
+            .replace('<', '\\u003c')
+            .replace('>', '\\u003e')
+            .replace('&', '\\u0026'))
+
+def write_script_json_array(f, values, batch_size=WRITE_BATCH_SIZE):
+    """Stream a list to f as a script-safe JSON array, a batch of items at a time.
+
+    Only one batch is ever serialized in memory, so long columns don't need a
+    second full-size copy as a JSON string.
+    """
+    f.write('[')
+    for start in range(0, len(values), batch_size):
+        if start:
+            f.write(',')
+        f.write(script_json(values[start:start + batch_size])[1:-1])
+    f.write(']')
+
+def _display_value(value, not_available):
+    """Format a record value for display, substituting missing or empty values."""
+    if isinstance(value, (list, tuple)):
+        value = ', '.join(str(item) for item in value)
+    elif value is None or value != value:  # missing or NaN
+        return not_available
+    return str(value) or not_available
+
+def escape_strings(obj):
+    """Return a copy of a JSON-like structure with every string HTML-escaped."""
+    if isinstance(obj, str):
+        return escape(obj)
+    if isinstance(obj, dict):
+        return {key: escape_strings(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [escape_strings(item) for item in obj]
+    return obj
+
+def column_getter(records):
+    """Return a function giving the raw values of a field across all records.
+
+    records may be a list of dicts or a DataFrame; DataFrames are read column
+    by column, without building a dict per row.
+    """
+    if hasattr(records, 'columns'):
+        def get_column(field, default=None):
+            if field in records.columns:
+                return records[field].tolist()
+            return [default] * len(records)
+        return get_column
+    return lambda field, default=None: [record.get(field, default) for record in records]
+
+def _sort_key(value):
+    # Missing and NaN values sort as empty strings rather than failing to compare
+    return str(value) if value is not None and value == value else ''
+
+def build_record_columns(records, not_available, order=None):
+    """HTML-escape the displayed fields of every record once.
+
+    Returns a dict mapping each field to a list of escaped strings, one per
+    record (in the given order of record indexes, if any), shared by the
+    detail pages and the main page script.
+    """
+    get_column = column_getter(records)
+    # Bound to locals since this runs once per field of every record; plain
+    # non-empty strings (the common case) skip the formatting call entirely
+    esc, display = escape, _display_value
+    # Values like visit types, providers and "not available" repeat across
+    # records, so each distinct one is escaped only once
+    escaped = {}
+    columns = {}
+    for field in COLUMN_FIELDS:
+        values = get_column(field)
+        if order is not None:
+            values = [values[i] for i in order]
+        if field in UNIQUE_FIELDS:
+            columns[field] = [
+                esc(value) if type(value) is str and value else esc(display(value, not_available))
+                for value in values
+            ]
+            continue
+        column = []
+        append = column.append
+        for value in values:
+            if not (type(value) is str and value):
+                value = display(value, not_available)
+            text = escaped.get(value)
+            if text is None:
+                text = escaped[value] = esc(value)
+            append(text)
+        columns[field] = column
+    return columns
 
 def get_document_summary(text):
     """Get document summary using AI/ML techniques."""
@@ -14,654 +159,330 @@ def get_document_summary(text):
     logging.info("Generating document summary")
     return "Summary of the document."
 
-def create_detail_page(record, output_dir):
-    """Create an individual HTML page for a record."""
-    filename = record['new_filename'].replace('.', '_') + '.html'
-    detail_path = os.path.join(output_dir, 'html', 'details', filename)
-    
-    # Load configuration to get language
-    config_path = os.path.join(os.path.dirname(__file__), 'config', 'config.yaml')
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-    
-    logging.info(f"Loaded config: {config}")
-    logging.info(f"Output language from config: {config.get('output_language', 'en')}")
-    
-    # Initialize translation manager with configured language
-    translations_dir = os.path.join(os.path.dirname(__file__), 'translations')
-    translator = TranslationManager(translations_dir, default_language='en')
-    translator.set_language(config.get('output_language', 'en'))
-    
-    # Get translations for static text
+@lru_cache(maxsize=None)
+def get_translator(language):
+    """Return a TranslationManager set to the given language, built once per language.
+
+    The instance is shared, so callers must not change its language.
+    """
+    translator = TranslationManager(TRANSLATIONS_DIR, default_language='en')
+    translator.set_language(language)
+    return translator
+
+@lru_cache(maxsize=None)
+def _detail_page_template(translator):
+    """Fill the language-dependent parts of the detail page template once.
+
+    Returns a Template with only the record field placeholders left.
+    """
     tr = translator.get_all_translations()
-    logging.info(f"Current language after setting: {translator.current_language}")
-    logging.info(f"Available translations: {list(tr.keys())}")
-    
-    html_content = f"""<!DOCTYPE html>
-<html lang="{tr['language_metadata']['code']}">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{tr['page_title']} - {record['new_filename']}</title>
-    <link rel="stylesheet" href="../styles.css">
-    <style>
-        .raw-text {{
-            white-space: pre-wrap;
-            font-family: monospace;
-            background-color: #f8f9fa;
-            padding: 1rem;
-            border-radius: 4px;
-            max-height: 400px;
-            overflow-y: auto;
-        }}
-    </style>
-</head>
-<body>
-    <div class="record-details">
-        <h2 class="record-title">{record['new_filename']}</h2>
-        <div class="actions">
-            <button class="btn btn-print" onclick="window.print()">
-                <svg width="16" height="16" fill="currentColor" viewBox="0 0 16 16">
-                    <path d="M2.5 8a.5.5 0 1 0 0-1 .5.5 0 0 0 0 1z"/>
-                    <path d="M5 1a2 2 0 0 0-2 2v2H2a2 2 0 0 0-2 2v3a2 2 0 0 0 2 2h1v1a2 2 0 0 0 2 2h6a2 2 0 0 0 2-2v-1h1a2 2 0 0 0 2-2V7a2 2 0 0 0-2-2h-1V3a2 2 0 0 0-2-2H5zM4 3a1 1 0 0 1 1-1h6a1 1 0 0 1 1 1v2H4V3zm1 5a2 2 0 0 0-2 2v1H2a1 1 0 0 1-1-1V7a1 1 0 0 1 1-1h12a1 1 0 0 1 1 1v3a1 1 0 0 1-1 1h-1v-1a2 2 0 0 0-2-2H5zm7 2v3a1 1 0 0 1-1 1H5a1 1 0 0 1-1-1v-3a1 1 0 0 1 1-1h6a1 1 0 0 1 1 1z"/>
-                </svg>
-                {tr['actions']['print']}
-            </button>
-            <a href="../../records/{record['new_filename']}" target="_blank" class="btn">{tr['actions']['view_original']}</a>
-        </div>
-        <table>
-            <tr><th>{tr['fields']['treatment_date_regex']}</th><td>{record.get('treatment_date', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['treatment_date_ai']}</th><td>{record.get('ai_treatment_date', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['visit_type']}</th><td>{record.get('visit_type', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['provider_name']}</th><td>{record.get('provider_name', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['provider_facility']}</th><td>{record.get('provider_facility', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['primary_condition']}</th><td>{record.get('primary_condition', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['diagnoses']}</th><td>{record.get('diagnoses', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['treatments']}</th><td>{record.get('treatments', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['medications']}</th><td>{record.get('medications', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['test_results']}</th><td>{record.get('test_results', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['summary']}</th><td>{record.get('summary', tr['status']['not_available'])}</td></tr>
-            <tr><th>{tr['fields']['last_processed']}</th><td>{record.get('last_processed', tr['status']['not_available'])}</td></tr>
-            <tr>
-                <th>{tr['fields']['raw_text']}</th>
-                <td><div class="raw-text">{record.get('text', tr['status']['not_available'])}</div></td>
-            </tr>
-        </table>
-    </div>
-</body>
-</html>"""
-    
-    os.makedirs(os.path.dirname(detail_path), exist_ok=True)
-    with open(detail_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    return os.path.join('html', 'details', filename)
+    labels = {f"{key}_label": label for key, label in tr['fields'].items()}
+    return Template(TemplateManager(TEMPLATES_DIR, translator).render(
+        'detail',
+        lang=tr['language_metadata']['code'],
+        page_title=tr['page_title'],
+        print_label=tr['actions']['print'],
+        view_original_label=tr['actions']['view_original'],
+        **labels
+    ))
+
+def detail_page_filename(new_filename):
+    return new_filename.replace('.', '_') + '.html'
+
+def render_detail_page(fields, translator=None):
+    """Render the HTML of an individual record page.
+
+    fields maps each displayed field to its already escaped value. Pass the
+    translator when rendering many pages so it's set up only once.
+    """
+    if translator is None:
+        config = _load_config(CONFIG_PATH)
+        translator = get_translator(config.get('output_language', 'en'))
+    # Only the record fields vary between pages; everything else is filled in once
+    return substitute(_detail_page_template(translator), dict(fields, filename=fields['new_filename']))
+
+@lru_cache(maxsize=16)
+def _details_dir(output_dir):
+    return os.path.join(output_dir, DETAIL_PAGES_SUBDIR)
+
+def create_detail_page(new_filename, fields, output_dir, translator=None):
+    """Create an individual HTML page for a record."""
+    filename = detail_page_filename(new_filename)
+    details_dir = _details_dir(output_dir)
+    detail_path = os.path.join(details_dir, filename)
+    data = render_detail_page(fields, translator).encode('utf-8')
+    try:
+        write_file_bytes(detail_path, data)
+    except FileNotFoundError:
+        # Only standalone callers get here; create_detail_pages makes the directory up front
+        os.makedirs(details_dir, exist_ok=True)
+        write_file_bytes(detail_path, data)
+    return os.path.join(DETAIL_PAGES_SUBDIR, filename)
+
+def write_file_bytes(path, data):
+    """Write a small file with one open/write/close and no Python buffering."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def create_detail_pages(filenames, columns, output_dir, archive=False, translator=None):
+    """Create the detail pages for all records.
+
+    filenames are the records' raw new_filename values, in the same order as
+    the escaped columns.
+
+    Pages are independent files, so they are rendered and written on a thread
+    pool; the blocking open/write/close calls of one page overlap with the
+    rendering of others.
+
+    With archive set, the pages are instead written into a single
+    html/details.tar, with html/details.index.json mapping each page to the
+    (offset, length) of its bytes in the archive, so one file is created
+    instead of one per record.
+    """
+    if not filenames:
+        return []
+    if translator is None:
+        # Resolve the shared, read-only translator once rather than in every worker
+        translator = get_translator(_load_config(CONFIG_PATH).get('output_language', 'en'))
+    rows = (dict(zip(columns, values)) for values in zip(*columns.values()))
+    if not archive:
+        os.makedirs(_details_dir(output_dir), exist_ok=True)
+    with ThreadPoolExecutor(max_workers=min(DETAIL_PAGE_WORKERS, len(filenames))) as executor:
+        if not archive:
+            return list(executor.map(partial(create_detail_page, output_dir=output_dir, translator=translator), filenames, rows))
+        pages = list(zip(
+            map(detail_page_filename, filenames),
+            executor.map(partial(render_detail_page, translator=translator), rows)
+        ))
+    return write_detail_archive(pages, os.path.join(output_dir, 'html'))
+
+def write_detail_archive(pages, html_dir):
+    """Write (filename, html) pairs to details.tar plus a byte-range index."""
+    archive_path = os.path.join(html_dir, 'details.tar')
+    index = {}
+    with atomic_open(archive_path, 'wb') as raw, \
+            tarfile.open(fileobj=raw, mode='w', bufsize=WRITE_BUFFER_SIZE, format=tarfile.PAX_FORMAT) as tar:
+        for filename, html_content in pages:
+            data = html_content.encode('utf-8')
+            info = tarfile.TarInfo(filename)
+            info.size = len(data)
+            header_size = len(info.tobuf(tar.format, tar.encoding, tar.errors))
+            index[filename] = (tar.offset + header_size, info.size)
+            tar.addfile(info, io.BytesIO(data))
+    with atomic_open(os.path.join(html_dir, 'details.index.json'), 'w', encoding='utf-8') as f:
+        f.write(json_dumps(index))
+    return [os.path.join('html', 'details.tar')]
 
 def create_html_page(records, output_path, overall_summary=None, pdf_filename=None):
     """Create main HTML page with links to detail pages.
     
     Args:
-        records: List of record dictionaries
+        records: List of record dictionaries, or a DataFrame
         output_path: Path to save the HTML file
         overall_summary: Optional dictionary containing overall patient summary
         pdf_filename: Optional filename of the compiled PDF file
     """
-    if not records:
+    if len(records) == 0:
         logging.warning("No records to create HTML page")
         return
 
-    # Ensure records is a list of dictionaries
-    if isinstance(records, pd.DataFrame):
-        records = records.to_dict('records')
-
-    # Sort records by filename (newest first)
-    sorted_records = sorted(records, key=lambda x: x.get('new_filename', ''), reverse=True)
-    
     # Load configuration to get language
-    config_path = os.path.join(os.path.dirname(__file__), 'config', 'config.yaml')
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = _load_config(CONFIG_PATH)
     
-    logging.info(f"Loaded config: {config}")
-    logging.info(f"Output language from config: {config.get('output_language', 'en')}")
+    # Debug-only, with lazy formatting so the config isn't stringified otherwise
+    logging.debug("Loaded config: %s", config)
+    logging.debug("Output language from config: %s", config.get('output_language', 'en'))
     
     output_short_summary_pdf = config.get('output_short_summary_pdf', 'overall_short_summary.pdf')
     
-    # Initialize translation manager with configured language
-    translations_dir = os.path.join(os.path.dirname(__file__), 'translations')
-    translator = TranslationManager(translations_dir, default_language='en')
-    translator.set_language(config.get('output_language', 'en'))
+    # Get the translation manager for the configured language
+    translator = get_translator(config.get('output_language', 'en'))
     
     # Get translations for static text
     tr = translator.get_all_translations()
-    logging.info(f"Current language after setting: {translator.current_language}")
-    logging.info(f"Available translations: {list(tr.keys())}")
+    logging.debug("Current language after setting: %s", translator.current_language)
+    logging.debug("Available translations: %s", tr.keys())
+    
+    # Get the absolute path of the output directory
+    output_dir = os.path.dirname(os.path.abspath(output_path))
     
     # Try to generate PDF
     pdf_status = {'available': False, 'error': None}
     if pdf_filename:
         try:
             from pdf_generator import generate_medical_records_pdf
-            pdf_path = os.path.join(os.path.dirname(output_path), pdf_filename)
-            generate_medical_records_pdf(config_path, pdf_path)
+            pdf_path = os.path.join(output_dir, pdf_filename)
+            generate_medical_records_pdf(CONFIG_PATH, pdf_path)
             pdf_status = {'available': True, 'error': None}
         except Exception as e:
             logging.error(f"Error generating PDF: {str(e)}")
             pdf_status = {'available': False, 'error': str(e)}
     
-    # Get the absolute path of the output directory
-    output_dir = os.path.dirname(os.path.abspath(output_path))
-    
-    # Filter out the short summary record from the left panel and sort in reverse chronological order
-    # The short summary record is identified by visit_type == 'Overall Summary'
-    filtered_records = sorted(
-        [r for r in sorted_records if r.get('visit_type', '') != 'Overall Summary'],
-        key=lambda x: x.get('treatment_date', ''),
-        reverse=True
-    )
+    # Filter out the short summary record from the left panel and sort in reverse chronological order,
+    # newest filename first within a date. The short summary record is identified by
+    # visit_type == 'Overall Summary'. Only the three key columns are read here; the
+    # result is an order of record indexes applied to each column as it is formatted.
+    get_column = column_getter(records)
+    new_filenames = get_column('new_filename')
+    keyed_records = [
+        (_sort_key(treatment_date), _sort_key(new_filename), i)
+        for i, (treatment_date, new_filename, visit_type) in enumerate(
+            zip(get_column('treatment_date'), new_filenames, get_column('visit_type')))
+        if visit_type != 'Overall Summary'
+    ]
+    keyed_records.sort(key=itemgetter(0, 1), reverse=True)
+    order = [i for _, _, i in keyed_records]
     
-    html_content = f"""<!DOCTYPE html>
-<html lang="{tr['language_metadata']['code']}">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{tr['page_title']}</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            height: 100vh;
-            display: flex;
-            flex-direction: column;
-            overflow: hidden;
-        }}
-        
-        header {{
-            background: #fff;
-            padding: 1rem;
-            border-bottom: 1px solid #ddd;
-            display: flex;
-            flex-direction: column;
-            gap: 0.5rem;
-            flex-shrink: 0;
-        }}
-        
-        .header-main {{
-            display: flex;
-            align-items: center;
-            gap: 1rem;
-        }}
-        
-        .header-info {{
-            background: #f8f9fa;
-            padding: 0.75rem;
-            border-radius: 4px;
-            font-size: 0.9rem;
-            color: #495057;
-            border: 1px solid #dee2e6;
-        }}
-        
-        .header-info code {{
-            background: #fff;
-            padding: 0.2rem 0.4rem;
-            border-radius: 3px;
-            font-family: 'Consolas', monospace;
-            border: 1px solid #e9ecef;
-        }}
-        
-        .logo {{
-            height: 40px;
-            width: auto;
-        }}
-        
-        h1 {{
-            color: #2c3e50;
-            font-size: 1.5rem;
-            margin: 0;
-        }}
-        
-        .content {{
-            display: flex;
-            flex: 1;
-            min-height: 0;  /* Important for nested flexbox scrolling */
-        }}
-        
-        .file-list {{
-            width: 33%;
-            background: #fff;
-            border-right: 1px solid #ddd;
-            display: flex;
-            flex-direction: column;
-            min-width: 300px;
-        }}
-        
-        .file-list-header {{
-            padding: 1rem;
-            background: #f8f9fa;
-            border-bottom: 1px solid #ddd;
-            font-weight: 600;
-            color: #2c3e50;
-        }}
-        
-        .file-list-content {{
-            flex: 1;
-            overflow-y: auto;
-            padding: 1rem;
-        }}
-        
-        .file-list ul {{
-            list-style: none;
-        }}
-        
-        .file-list li {{
-            padding: 0.75rem 1rem;
-            cursor: pointer;
-            border-radius: 4px;
-            margin-bottom: 0.25rem;
-            border-left: 3px solid transparent;
-            display: flex;
-            align-items: center;
-            transition: all 0.2s ease;
-        }}
-        
-        .file-list li .number {{
-            color: #666;
-            font-size: 0.9em;
-            margin-right: 1rem;
-            min-width: 2em;
-            text-align: right;
-        }}
-        
-        .file-list li:hover {{
-            background: #f5f6fa;
-        }}
-        
-        .file-list li.active {{
-            background: #e3f2fd;
-            border-left-color: #3498db;
-            font-weight: 600;
-        }}
-        
-        .detail-view {{
-            width: 67%;
-            background: #f5f6fa;
-            display: flex;
-            flex-direction: column;
-            min-width: 0;  /* Important for text truncation */
-        }}
-        
-        .detail-view-content {{
-            flex: 1;
-            overflow-y: auto;
-            padding: 2rem;
-        }}
-        
-        .record-details {{
-            background: white;
-            border-radius: 8px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-            padding: 2rem;
-            max-width: 1200px;
-            margin: 0 auto;
-        }}
-        
-        .overall-summary {{
-            background: white;
-            border-radius: 8px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-            padding: 2rem;
-            margin-bottom: 2rem;
-        }}
-        
-        .summary-section {{
-            margin-top: 1.5rem;
-        }}
-        
-        .summary-section h3 {{
-            color: #2c3e50;
-            margin-bottom: 0.5rem;
-            font-size: 1.1rem;
-        }}
-        
-        table {{
-            width: 100%;
-            border-collapse: collapse;
-            margin-top: 1rem;
-        }}
-        
-        th, td {{
-            padding: 1rem;
-            text-align: left;
-            border-bottom: 1px solid #ddd;
-        }}
-        
-        th {{
-            width: 200px;
-            background: #f8f9fa;
-            font-weight: 600;
-        }}
-        
-        .actions {{
-            margin-bottom: 1rem;
-            text-align: right;
-        }}
-        
-        .btn {{
-            display: inline-flex;
-            align-items: center;
-            gap: 0.5rem;
-            padding: 0.5rem 1rem;
-            background: #fff;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-            color: #333;
-            text-decoration: none;
-            font-size: 0.9rem;
-            cursor: pointer;
-            transition: all 0.2s;
-        }}
-        
-        .btn:hover {{
-            background: #f8f9fa;
-            border-color: #ccc;
-        }}
-        
-        .btn-print svg {{
-            margin-right: 0.25rem;
-        }}
-        
-        @media print {{
-            body {{
-                overflow: visible;
-                display: block;
-            }}
-            
-            .file-list, .actions {{
-                display: none;
-            }}
-            
-            .detail-view {{
-                width: 100%;
-                overflow: visible;
-            }}
-            
-            .detail-view-content {{
-                overflow: visible;
-            }}
-        }}
-        
-        .pdf-button {{
-            position: fixed;
-            top: 1rem;
-            right: 1rem;
-            z-index: 1000;
-            padding: 0.5rem 1rem;
-            background-color: #4CAF50;
-            color: white;
-            border: none;
-            border-radius: 4px;
-            cursor: pointer;
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-            font-size: 0.9rem;
-            transition: background-color 0.2s;
-        }}
-        .pdf-button:hover {{
-            background-color: #45a049;
-        }}
-        .pdf-button.error {{
-            background-color: #f44336;
-        }}
-        .pdf-button.error:hover {{
-            background-color: #da190b;
-        }}
-        .pdf-error {{
-            display: none;
-            position: fixed;
-            top: 4rem;
-            right: 1rem;
-            background-color: #f44336;
-            color: white;
-            padding: 1rem;
-            border-radius: 4px;
-            max-width: 300px;
-            z-index: 1000;
-        }}
-    </style>
-</head>
-<body>
-    {f'''
-    <button onclick="handlePdfClick()" class="pdf-button {'error' if pdf_status['error'] else ''}" title="{pdf_status['error'] if pdf_status['error'] else tr['actions']['view_complete_pdf']}">
-        <svg width="16" height="16" fill="currentColor" viewBox="0 0 16 16">
-            <path d="M5.523 12.424c.14-.082.293-.162.459-.238a7.878 7.878 0 0 1-.45.606c-.28.337-.498.516-.635.572a.266.266 0 0 1-.035.012.282.282 0 0 1-.026-.044c-.056-.11-.054-.216.04-.36.106-.165.319-.354.647-.548zm2.455-1.647c-.119.025-.237.05-.356.078a21.148 21.148 0 0 0 .5-1.05 12.045 12.045 0 0 0 .51.858c-.217.032-.436.07-.654.114zm2.525.939a3.881 3.881 0 0 1-.435-.41c.228.005.434.022.612.054.317.057.466.147.518.209a.095.095 0 0 1 .026.064.436.436 0 0 1-.06.2.307.307 0 0 1-.094.124.107.107 0 0 1-.069.015c-.09-.003-.258-.066-.498-.256zM8.278 6.97c-.04.244-.108.524-.2.829a4.86 4.86 0 0 1-.089-.346c-.076-.353-.087-.63-.046-.822.038-.177.11-.248.196-.283a.517.517 0 0 1 .145-.04c.013.03.028.092.032.198.005.122-.007.277-.038.465z"/>
-            <path fill-rule="evenodd" d="M4 0h8a2 2 0 0 1 2 2v12a2 2 0 0 1-2 2H4a2 2 0 0 1-2-2V2a2 2 0 0 1 2-2zm0 1a1 1 0 0 0-1 1v12a1 1 0 0 0 1 1h8a1 1 0 0 0 1-1V2a1 1 0 0 0-1-1H4z"/>
-        </svg>
-        {tr['actions']['view_complete_pdf']}
-    </button>
-    <div id="pdfError" class="pdf-error"></div>
-    ''' if pdf_filename else ''}
-    <header>
-        <div class="header-main">
-            <img src="html/Logo.png" alt="Logo" class="logo">
-            <h1>{tr['page_title']}</h1>
-            {f'<a href="records/{pdf_filename}" target="_blank" class="btn">{tr["actions"]["view_complete_pdf"]}</a>' if pdf_filename else ''}
-        </div>
-    </header>
-    <div class="content">
-        <div class="file-list">
-            <div class="file-list-header">
-                {tr['pdf']['records_included']} ({len(filtered_records)})
-            </div>
-            <div class="file-list-content">
-                <ul>
-                    <li class="file-item" data-index="-1">
-                        <span class="number">1.</span>
-                        {tr['pdf']['overall_summary']}
-                    </li>
-                    {''.join([
-                        f'<li class="file-item" data-index="{i}">'
-                        f'<span class="number">{i + 2}.</span>'
-                        f'{record.get("new_filename", "Unnamed Record")}'
-                        f'</li>'
-                        for i, record in enumerate(filtered_records)
-                    ])}
-                </ul>
-            </div>
-        </div>
-        <div class="detail-view">
-            <div class="detail-view-content">
-                <div class="record-details">
-                    <p>Select a record from the list to view details.</p>
-                </div>
-            </div>
-        </div>
-    </div>
-    <script>
-        // Initialize records data (including overall summary and short summary PDF name)
-        const records = {json.dumps(filtered_records)};
-        const overallSummary = {json.dumps(overall_summary) if overall_summary else 'null'};
-        const translations = {json.dumps(tr)};
-        const pdfStatus = {json.dumps(pdf_status)};
-        const shortSummaryPdf = "{output_short_summary_pdf}";
-        let currentIndex = -1;
-        
-        // Format lists for display
-        function formatList(items) {{
-            if (!items) return translations.status.not_available;
-            if (typeof items === 'string') return items;
-            if (Array.isArray(items)) return items.join(', ') || translations.status.not_available;
-            return translations.status.not_available;
-        }}
-        
-        // Helper function to format array sections
-        const formatArraySection = (array, listType = '') => {{
-            if (!array || !Array.isArray(array)) return translations.status.not_available;
-            if (listType === 'bullet') {{
-                return '<ul>' + array.map(item => '<li>' + item + '</li>').join('') + '</ul>';
-            }}
-            return array.map(item => '<p>' + item + '</p>').join('');
-        }};
-        
-        // Show record details
-        function showRecord(index) {{
-            // Update active state in file list
-            document.querySelectorAll('.file-item').forEach(item => item.classList.remove('active'));
-            const activeItem = document.querySelector(`[data-index="${{index}}"]`);
-            if (activeItem) {{
-                activeItem.classList.add('active');
-            }}
-            
-            if (index === -1) {{
-                // Show overall summary
-                const summaryHtml = '<div class="record-details">' +
-                    '<div class="actions">' +
-                        '<button class="btn btn-print" onclick="window.print()">' +
-                            '<svg width="16" height="16" fill="currentColor" viewBox="0 0 16 16">' +
-                                '<path d="M2.5 8a.5.5 0 1 0 0-1 .5.5 0 0 0 0 1z"/>' +
-                                '<path d="M5 1a2 2 0 0 0-2 2v2H2a2 2 0 0 0-2 2v3a2 2 0 0 0 2 2h1v1a2 2 0 0 0 2 2h6a2 2 0 0 0 2-2v-1h1a2 2 0 0 0 2-2V7a2 2 0 0 0-2-2h-1V3a2 2 0 0 0-2-2H5zM4 3a1 1 0 0 1 1-1h6a1 1 0 0 1 1 1v2H4V3zm1 5a2 2 0 0 0-2 2v1H2a1 1 0 0 1-1-1V7a1 1 0 0 1 1-1h12a1 1 0 0 1 1 1v3a1 1 0 0 1-1 1h-1v-1a2 2 0 0 0-2-2H5zm7 2v3a1 1 0 0 1-1 1H5a1 1 0 0 1-1-1v-3a1 1 0 0 1 1-1h6a1 1 0 0 1 1 1z"/>' +
-                            '</svg>' +
-                            translations.actions.print +
-                        '</button>' +
-                        '<a href="' + shortSummaryPdf + '" target="_blank" class="btn">' + translations.actions.view_original + '</a>' +
-                    '</div>' +
-                    '<h2>' + translations.pdf.overall_summary + '</h2>' +
-                    '<div class="summary-section">' +
-                        '<h3>' + translations.summary_sections.patient_description + '</h3>' +
-                        '<p>' + (overallSummary?.patient?.section || translations.status.not_available) + '</p>' +
-                    '</div>' +
-                    '<div class="summary-section">' +
-                        '<h3>' + translations.summary_sections.medical_history + '</h3>' +
-                        formatArraySection(overallSummary?.medical_history?.section, 'bullet') +
-                    '</div>' +
-                    '<div class="summary-section">' +
-                        '<h3>' + translations.summary_sections.summary + '</h3>' +
-                        formatArraySection(overallSummary?.summary?.section) +
-                    '</div>' +
-                    '<div class="summary-section">' +
-                        '<h3>' + translations.summary_sections.key_findings + '</h3>' +
-                        formatArraySection(overallSummary?.key_findings?.section, 'bullet') +
-                    '</div>' +
-                    '<div class="summary-section">' +
-                        '<h3>' + translations.summary_sections.recommendations + '</h3>' +
-                        formatArraySection(overallSummary?.recommendations?.section, 'bullet') +
-                    '</div>' +
-                '</div>';
-                document.querySelector('.record-details').innerHTML = summaryHtml;
-                currentIndex = -1;
-            }} else if (index >= 0 && index < records.length) {{
-                currentIndex = index;
-                const record = records[index];
-                
-                // Update record details
-                const detailsHtml = 
-                    '<div class="actions">' +
-                        '<button class="btn btn-print" onclick="window.print()">' +
-                            '<svg width="16" height="16" fill="currentColor" viewBox="0 0 16 16">' +
-                                '<path d="M2.5 8a.5.5 0 1 0 0-1 .5.5 0 0 0 0 1z"/>' +
-                                '<path d="M5 1a2 2 0 0 0-2 2v2H2a2 2 0 0 0-2 2v3a2 2 0 0 0 2 2h1v1a2 2 0 0 0 2 2h6a2 2 0 0 0 2-2v-1h1a2 2 0 0 0 2-2V7a2 2 0 0 0-2-2h-1V3a2 2 0 0 0-2-2H5zM4 3a1 1 0 0 1 1-1h6a1 1 0 0 1 1 1v2H4V3zm1 5a2 2 0 0 0-2 2v1H2a1 1 0 0 1-1-1V7a1 1 0 0 1 1-1h12a1 1 0 0 1 1 1v3a1 1 0 0 1-1 1h-1v-1a2 2 0 0 0-2-2H5zm7 2v3a1 1 0 0 1-1 1H5a1 1 0 0 1-1-1v-3a1 1 0 0 1 1-1h6a1 1 0 0 1 1 1z"/>' +
-                            '</svg>' +
-                            translations.actions.print +
-                        '</button>' +
-                        '<a href="records/' + record.new_filename + '" target="_blank" class="btn">' + translations.actions.view_original + '</a>' +
-                    '</div>' +
-                    '<table>' +
-                        '<tr><th>' + translations.fields.treatment_date_regex + '</th><td>' + (record.treatment_date || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.treatment_date_ai + '</th><td>' + (record.ai_treatment_date || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.visit_type + '</th><td>' + (record.visit_type || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.provider_name + '</th><td>' + (record.provider_name || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.provider_facility + '</th><td>' + (record.provider_facility || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.primary_condition + '</th><td>' + (record.primary_condition || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.diagnoses + '</th><td>' + formatList(record.diagnoses) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.treatments + '</th><td>' + formatList(record.treatments) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.medications + '</th><td>' + formatList(record.medications) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.test_results + '</th><td>' + formatList(record.test_results) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.summary + '</th><td>' + (record.summary || translations.status.not_available) + '</td></tr>' +
-                        '<tr><th>' + translations.fields.last_processed + '</th><td>' + (record.last_processed || translations.status.not_available) + '</td></tr>' +
-                    '</table>';
-                
-                document.querySelector('.record-details').innerHTML = detailsHtml;
-            }}
-        }}
-        
-        // Navigation functions
-        function navigateUp() {{
-            if (currentIndex > -1) {{
-                showRecord(currentIndex - 1);
-            }}
-        }}
-        
-        function navigateDown() {{
-            if (currentIndex < records.length - 1) {{
-                showRecord(currentIndex + 1);
-            }}
-        }}
-        
-        // Event listeners
-        document.addEventListener('DOMContentLoaded', function() {{
-            // Add click listeners to file items
-            document.querySelectorAll('.file-item').forEach(item => {{
-                item.addEventListener('click', function() {{
-                    const index = parseInt(this.getAttribute('data-index'));
-                    showRecord(index);
-                }});
-            }});
-            
-            // Keyboard navigation
-            document.addEventListener('keydown', function(e) {{
-                if (e.key === 'ArrowUp') {{
-                    e.preventDefault();
-                    navigateUp();
-                }} else if (e.key === 'ArrowDown') {{
-                    e.preventDefault();
-                    navigateDown();
-                }}
-            }});
-            
-            // Show first record by default
-            showRecord(-1);
-        }});
-        
-        function handlePdfClick() {{
-            if (pdfStatus.available) {{
-                window.open('{pdf_filename}', '_blank');
-            }} else if (pdfStatus.error) {{
-                const errorDiv = document.getElementById('pdfError');
-                errorDiv.textContent = pdfStatus.error;
-                errorDiv.style.display = 'block';
-                setTimeout(() => {{
-                    errorDiv.style.display = 'none';
-                }}, 5000);
-            }}
-        }}
-    </script>
-</body>
-</html>"""
-
-    # Write the HTML file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    template_manager = TemplateManager(TEMPLATES_DIR, translator)
+    pdf_button = ''
+    pdf_link = ''
+    if pdf_filename:
+        pdf_button = template_manager.render(
+            'pdf_button',
+            error_class='error' if pdf_status['error'] else '',
+            title=escape(pdf_status['error'] or tr['actions']['view_complete_pdf']),
+            label=tr['actions']['view_complete_pdf']
+        )
+        pdf_link = f'<a href="records/{escape(pdf_filename)}" target="_blank" class="btn">{tr["actions"]["view_complete_pdf"]}</a>'
+
+    columns = build_record_columns(records, tr['status']['not_available'], order)
+
+    def write_file_items(f):
+        # Joined and written a batch at a time, so large record sets never
+        # hold the whole list as one string
+        filenames = columns['new_filename']
+        for start in range(0, len(filenames), WRITE_BATCH_SIZE):
+            f.write(''.join([
+                f'<li class="file-item" data-index="{i}">'
+                f'<span class="number">{i + 2}.</span>'
+                f'{filename}'
+                f'</li>'
+                for i, filename in enumerate(filenames[start:start + WRITE_BATCH_SIZE], start)
+            ]))
+
+    def write_record_columns(f):
+        # One column at a time; the raw text is only needed by the detail pages
+        f.write('{')
+        for i, field in enumerate(PAGE_COLUMN_FIELDS):
+            f.write(f'{"," if i else ""}"{field}":')
+            write_script_json_array(f, columns[field])
+        f.write('}')
+
+    # Optionally keep the record data out of the page so the browser can fetch
+    # and parse it natively after first paint (requires serving over HTTP)
+    records_file = None
+    if config.get('records_json_file', False):
+        records_file = os.path.splitext(os.path.basename(output_path))[0] + '_records.json'
+        with atomic_open(os.path.join(output_dir, records_file), 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            write_record_columns(f)
+
+    # Stream the page to disk section by section through a large write buffer,
+    # replacing any previous page only once the new one is complete
+    with atomic_open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        template_manager.stream(
+            'main',
+            f,
+            lang=tr['language_metadata']['code'],
+            page_title=tr['page_title'],
+            pdf_button=pdf_button,
+            pdf_link=pdf_link,
+            records_included=tr['pdf']['records_included'],
+            record_count=len(order),
+            overall_summary_label=tr['pdf']['overall_summary'],
+            file_items=write_file_items,
+            record_columns_json='null' if records_file else write_record_columns,
+            record_columns_src_json=script_json(records_file),
+            summary_json=script_json(escape_strings(overall_summary)) if overall_summary else 'null',
+            pdf_status_json=script_json(pdf_status),
+            short_summary_pdf_json=script_json(output_short_summary_pdf),
+            pdf_filename_json=script_json(pdf_filename)
+        )
     
-    # Create detail pages directory
-    details_dir = os.path.join(output_dir, 'html', 'details')
-    os.makedirs(details_dir, exist_ok=True)
+    if config.get('compress_outputs', False):
+        write_zstd_copy(output_path)
+        if records_file:
+            write_zstd_copy(os.path.join(output_dir, records_file))
+
+    # The viewer renders the same record table itself, so the standalone
+    # detail pages can be switched off to halve the generated HTML
+    if not config.get('write_detail_pages', True):
+        return
+
+    os.makedirs(os.path.join(output_dir, 'html'), exist_ok=True)
+
+    # Styles and icons shared by every detail page are written once, not inlined per page
+    for asset in DETAIL_PAGE_ASSETS:
+        shutil.copyfile(os.path.join(HTML_ASSETS_DIR, asset), os.path.join(output_dir, 'html', asset))
     
     # Create individual detail pages (for filtered records only, since summary has no detail page)
-    for record in filtered_records:
-        create_detail_page(record, output_dir)
+    create_detail_pages([new_filenames[i] for i in order], columns, output_dir,
+                        archive=config.get('detail_pages_archive', False), translator=translator)
+
+CSV_FIELDS = ['File Path', 'Original Filename', 'New Filename', 'Checksum', 'Summary', 'Text', 'API Response']
+
+def _csv_strings(values, default=''):
+    """Normalize a column to strings, with missing cells (None/NaN) as default."""
+    return [
+        default if value is None or (isinstance(value, float) and math.isnan(value))
+        else value if isinstance(value, str) else str(value)
+        for value in values
+    ]
+
+def _csv_columns(records):
+    """Return the CSV columns as lists, in CSV_FIELDS order.
+
+    Read column by column, so a DataFrame from upstream is used as-is and no
+    per-row tuples are built along the way.
+    """
+    get_column = column_getter(records)
+    return [
+        _csv_strings(get_column('file_path')),
+        _csv_strings(get_column('original_filename')),
+        _csv_strings(get_column('new_filename')),
+        _csv_strings(get_column('checksum')),
+        _csv_strings(get_column('summary', 'No summary available'), 'No summary available'),
+        _csv_strings(get_column('text')),
+        [json_dumps(response) for response in get_column('api_response', {})]
+    ]
+
+@lru_cache(maxsize=None)
+def _import_pyarrow():
+    """Return (pyarrow, pyarrow.csv), or None when pyarrow isn't installed.
+
+    Imported on first use so loading this module doesn't pay for it.
+    """
+    try:
+        import pyarrow
+        import pyarrow.csv
+    except ImportError:
+        return None
+    return pyarrow, pyarrow.csv
 
 def save_to_csv(records, csv_path):
-    """Save extracted data and metadata to CSV file."""
-    df = pd.DataFrame([{
-        'File Path': r['file_path'],
-        'Original Filename': r['original_filename'],
-        'New Filename': r['new_filename'],
-        'Checksum': r['checksum'],
-        'Summary': r.get('summary', 'No summary available'),
-        'Text': r['text'],
-        'API Response': r.get('api_response', {})
-    } for r in records])
-    
-    df.to_csv(csv_path, index=False)
-    logging.info(f"Saved extracted data to CSV: {csv_path}")
\ No newline at end of file
+    """Save extracted data and metadata to CSV file.
+
+    records may be a list of dicts or a DataFrame.
+    """
+    columns = _csv_columns(records)
+    arrow = _import_pyarrow()
+    if arrow is not None:
+        pa, pa_csv = arrow
+        # Arrow's multithreaded C++ writer is much faster on the large text
+        # columns; the column lists are handed over as Arrow string arrays
+        # directly, with no pandas object-dtype frame in between
+        table = pa.table({field: pa.array(values, type=pa.string()) for field, values in zip(CSV_FIELDS, columns)})
+        with atomic_open(csv_path, 'wb') as f:
+            pa_csv.write_csv(table, f, write_options=pa_csv.WriteOptions(batch_size=4096))
+    else:
+        # Rows are zipped lazily from the columns and streamed straight to disk
+        # through a large buffer rather than building a DataFrame first
+        with atomic_open(csv_path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(CSV_FIELDS)
+            writer.writerows(zip(*columns))
+    logging.info(f"Saved extracted data to CSV: {csv_path}")
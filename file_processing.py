@@ -1,34 +1,139 @@
 import os
+import hashlib
 import logging
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from checksum_utils import calculate_checksum, calculate_checksum_from_bytes
+from file_utils import SINGLE_READ_MAX_BYTES, TXT_MMAP_THRESHOLD, atomic_open
 from text_extraction import extract_text_from_txt, extract_text_from_pdf, extract_text_from_image, extract_text_from_docx, extract_text_from_excel
 
+# Extractors by file extension; images are OCRed and also need the language
+IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.tiff'})
+TEXT_EXTRACTORS = {
+    '.txt': extract_text_from_txt,
+    '.pdf': extract_text_from_pdf,
+    '.docx': extract_text_from_docx,
+    '.xls': extract_text_from_excel,
+    '.xlsx': extract_text_from_excel,
+}
+KNOWN_EXTENSIONS = IMAGE_EXTENSIONS | frozenset(TEXT_EXTRACTORS)
+
+def file_extension(file_path):
+    """Return the lower-cased extension of a path, like os.path.splitext but cheaper."""
+    dot = file_path.rfind('.')
+    sep = file_path.rfind(os.sep)
+    if os.altsep:
+        sep = max(sep, file_path.rfind(os.altsep))
+    # No dot in the file name itself, or only a leading one (".DS_Store")
+    if dot <= sep + 1:
+        return ''
+    return file_path[dot:].lower()
+
+def get_text_cache_dir(config):
+    """Directory for cached extracted text, or None when caching is disabled."""
+    if not config.get('cache_extracted_text', True):
+        return None
+    # Kept outside data_files/, which is cleared at the start of every run
+    return os.path.join(config['output_location'], 'cache', 'extracted_text')
+
+def _text_cache_path(cache_dir, file_path, data, ext, config):
+    # Keyed on the file contents, plus the OCR settings for images since they
+    # change the result
+    key_data = calculate_checksum_from_bytes(data) if data is not None else calculate_checksum(file_path)
+    if ext in IMAGE_EXTENSIONS:
+        key_data += f"\0{config.get('ocr_language', 'eng+ita')}\0{bool(config.get('ocr_preprocess', False))}"
+    return os.path.join(cache_dir, f"{hashlib.sha256(key_data.encode('utf-8')).hexdigest()}.txt")
+
+def _skip_by_size(file_path, size, config):
+    """Whether a file is empty or over the configured size limit."""
+    if size == 0:
+        logging.info(f"Skipping empty file: {file_path}")
+        return True
+    max_size_mb = config.get('max_file_size_mb', 0)
+    if max_size_mb and size > max_size_mb * 1024 * 1024:
+        logging.warning(f"Skipping {file_path}: {size / (1024 * 1024):.0f} MB exceeds max_file_size_mb ({max_size_mb})")
+        return True
+    return False
+
 def process_file(file_path, config, openai_api_key):  # Added openai_api_key parameter
-    ext = os.path.splitext(file_path)[1].lower()
-    logging.debug(f"Processing file: {file_path} with extension: {ext}")
-    
-    if ext == '.txt':
-        text = extract_text_from_txt(file_path)
-    elif ext == '.pdf':
-        text = extract_text_from_pdf(file_path)
-    elif ext in ['.png', '.jpg', '.jpeg', '.tiff']:
-        lang = config.get('ocr_language', 'eng+ita')  # Extract language from config
-        text = extract_text_from_image(file_path, lang)  # Pass the language code
-    elif ext == '.docx':
-        text = extract_text_from_docx(file_path)
-    elif ext in ['.xls', '.xlsx']:
-        text = extract_text_from_excel(file_path)
-    else:
+    ext = file_extension(file_path)
+    logging.debug("Processing file: %s with extension: %s", file_path, ext)
+    
+    # The file is read once; hashing and extraction share the same bytes
+    # Unsupported files are skipped before being opened or hashed
+    if ext not in KNOWN_EXTENSIONS:
         logging.warning(f"Unrecognized file type for file: {file_path}. Skipping processing.")
         return ''  # Return empty string for unrecognized file types
     
-    logging.debug(f"Extracted text: {text[:100]}...")  # Log the first 100 characters of the extracted text
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if _skip_by_size(file_path, size, config):
+            return ''
+        # Large text files are memory-mapped by the extractor instead
+        read_limit = TXT_MMAP_THRESHOLD if ext == '.txt' else SINGLE_READ_MAX_BYTES
+        data = f.read() if size < read_limit else None
+    
+    # Unchanged files reuse the text extracted by an earlier run instead of
+    # being parsed or OCRed again
+    cache_path = None
+    cache_dir = get_text_cache_dir(config)
+    if cache_dir:
+        cache_path = _text_cache_path(cache_dir, file_path, data, ext, config)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                logging.debug("Using cached text from %s", cache_path)
+                return f.read()
+        except FileNotFoundError:
+            pass
+    
+    if ext in IMAGE_EXTENSIONS:
+        lang = config.get('ocr_language', 'eng+ita')  # Extract language from config
+        text = extract_text_from_image(file_path, lang, data, preprocess=config.get('ocr_preprocess', False))  # Pass the language code
+    else:
+        text = TEXT_EXTRACTORS[ext](file_path, data)
+    
+    # Log the first 100 characters of the extracted text; checked first so the
+    # text isn't sliced for every file when debug logging is off
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Extracted text: %s...", text[:100])
     
     if not text:
         logging.warning(f"No valid text extracted from {file_path}")
+    elif cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with atomic_open(cache_path, 'w', encoding='utf-8') as f:
+            f.write(text)
     
     return text
 
+# OCR and PDF parsing are CPU-bound, so extract several files at once in
+# separate processes; beyond a handful of workers disk and memory dominate
+EXTRACTION_WORKERS = min(os.cpu_count() or 1, 6)
+
+def _process_file_safe(file_path, config, openai_api_key):
+    # Runs in a worker process; errors are returned rather than raised so one
+    # bad file doesn't stop the results of the others
+    try:
+        return process_file(file_path, config, openai_api_key), None
+    except Exception as e:
+        return None, str(e)
+
+def process_files_parallel(file_paths, config, openai_api_key):
+    """Extract the text of several files in parallel worker processes.
+
+    Yields a (text, error) tuple per file, in the order of file_paths, as soon
+    as each one is available; error is None on success.
+    """
+    file_paths = list(file_paths)
+    worker = partial(_process_file_safe, config=config, openai_api_key=openai_api_key)
+    max_workers = min(config.get('extraction_workers') or EXTRACTION_WORKERS, len(file_paths))
+    if max_workers <= 1:
+        yield from map(worker, file_paths)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(worker, file_paths, chunksize=4)
+
 def is_continuation_of_previous(current_file_path, previous_file_path):
     """Determine if the current file is a continuation of the previous file."""
     if previous_file_path is None:
@@ -0,0 +1,60 @@
+import os
+import logging
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# mkstemp creates files readable only by the owner; atomic_open gives them
+# the permissions open() would have
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Files up to this size are read into memory once and shared between
+# checksumming and text extraction; larger ones are read from disk twice
+# rather than held in RAM twice
+SINGLE_READ_MAX_BYTES = 64 * 1024 * 1024
+# Text files at least this large are decoded straight from a memory map
+TXT_MMAP_THRESHOLD = 1024 * 1024
+
+@contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    """Open a temporary file next to path and move it into place on success.
+
+    Readers never see a partially written file, and a failed write leaves any
+    previous version untouched. Each call writes its own uniquely named temp
+    file, so concurrent writers to the same path don't interfere; the last
+    to finish wins. Accepts the same arguments as open().
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        os.fchmod(fd, 0o666 & ~_UMASK)
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_zstd_copy(path, level=3):
+    """Write a zstandard-compressed copy of a file to path + '.zst'.
+
+    Large generated outputs (the viewer page embeds every record) shrink
+    several-fold, which helps when they are served with
+    Content-Encoding: zstd or archived. Returns the compressed path, or None
+    when the zstandard package isn't installed.
+    """
+    if zstandard is None:
+        logging.warning(f"zstandard is not installed; skipping compressed copy of {path}")
+        return None
+    compressed_path = f"{path}.zst"
+    compressor = zstandard.ZstdCompressor(level=level, threads=-1)
+    with open(path, 'rb') as src, atomic_open(compressed_path, 'wb') as dst:
+        compressor.copy_stream(src, dst)
+    return compressed_path
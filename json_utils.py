@@ -0,0 +1,27 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_dumps(obj, indent=False):
+    """Serialize obj to a JSON string, using orjson when it is installed.
+
+    Values JSON has no type for (pandas timestamps, UUIDs, ...) are written
+    with str(). Output is compact unless indent is set.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=str, option=option).decode('utf-8')
+    if indent:
+        return json.dumps(obj, indent=2, default=str)
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+def json_loads(data):
+    """Deserialize a JSON string or bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -5,24 +5,34 @@ import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime as dt
 from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import json
 import pandas as pd
 from translator import Translator
 import shutil
-from pdf_generator import generate_medical_records_pdf, generate_overall_summary_pdf
 
-from ai_utils import *
-from checksum_utils import *
-from file_processing import *
-from metadata import find_first_date_in_text, create_new_filename
-from document_utils import *
+from checksum_utils import (append_processed_checksum, calculate_checksums_bulk, load_checksum_index,
+                            save_checksum_index, load_processed_checksums, migrate_legacy_checksum, prune_legacy_checksums,
+                            save_processed_checksums)
+from metadata import extract_first_date_series, create_new_filename
+from json_utils import json_loads
+from file_utils import write_zstd_copy
+from document_utils import create_html_page
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@lru_cache(maxsize=1)
+def _default_translator():
+    """Translator for the bundled translations, loaded once per process."""
+    return Translator(os.path.join(MODULE_DIR, 'translations'))
 
 def setup_logging():
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-    log_filename = os.path.join(os.path.dirname(__file__), 'medical_rec_process.log')
+    log_filename = os.path.join(MODULE_DIR, 'medical_rec_process.log')
     handler = RotatingFileHandler(
         log_filename,
         maxBytes=250000,
@@ -41,13 +51,14 @@ def substitute_config_variables(config_dict, translator=None):
     if not isinstance(config_dict, dict):
         return config_dict
     if translator is None:
-        translator = Translator(os.path.join(os.path.dirname(__file__), 'translations'))
+        translator = _default_translator()
     output_language = config_dict.get('output_language', 'en')
     language_name = translator.get_language_name(output_language)
 
     def _substitute_in_value(value):
         if isinstance(value, str):
-            return value.replace('${output_language}', language_name)
+            # Most config strings have no placeholder at all
+            return value.replace('${output_language}', language_name) if '${' in value else value
         elif isinstance(value, dict):
             return {k: _substitute_in_value(v) for k, v in value.items()}
         elif isinstance(value, list):
@@ -87,7 +98,7 @@ def ensure_output_location(config):
     os.makedirs(os.path.join(output_location, 'html'), exist_ok=True)
     os.makedirs(os.path.join(output_location, 'records'), exist_ok=True)
     os.makedirs(os.path.join(output_location, 'data_files'), exist_ok=True)
-    web_page_dir = os.path.join(os.path.dirname(__file__), 'web_page')
+    web_page_dir = os.path.join(MODULE_DIR, 'web_page')
     output_html_dir = os.path.join(output_location, 'html')
     logo_target = os.path.join(output_html_dir, 'Logo.png')
     if not os.path.exists(logo_target):
@@ -128,6 +139,8 @@ Generated on: """ + dt.now().strftime('%Y-%m-%d %H:%M:%S')
     logging.info(f"Ensured output directories exist at: {output_location}")
 
 def process_files(config):
+    # Deferred so the OCR and document libraries load only when files are processed
+    from file_processing import process_files_parallel
     scans_location, output_location = ensure_directories(config)
     ensure_output_location(config)
     output_html = config.get('output_html', 'output.html')
@@ -137,12 +150,11 @@ def process_files(config):
     extracted_data_file = os.path.join(output_location, 'data_files', 'extracted_data.csv')
     logging.info(f"Processing settings: skip_processed={skip_processed}, review_interval={skip_process_review_interval} days")
     processed_checksums = load_processed_checksums(checksums_file)
-    existing_records = []
+    existing_df = pd.DataFrame()
     if skip_processed and os.path.exists(extracted_data_file):
         try:
             existing_df = pd.read_csv(extracted_data_file)
-            existing_records = existing_df.to_dict('records')
-            logging.info(f"Loaded {len(existing_records)} existing records from {extracted_data_file}")
+            logging.info(f"Loaded {len(existing_df)} existing records from {extracted_data_file}")
         except Exception as e:
             logging.error(f"Error loading existing records: {e}")
     new_records = []
@@ -162,9 +174,22 @@ def process_files(config):
     if files_found:
         total_files = len(all_files)
         print(f"\nFound {total_files} files to examine")
+        # Files unchanged since the last run (same path, size and modification
+        # time) reuse their checksum instead of being hashed again. The index
+        # lives under cache/, which survives the cleanup of data_files/.
+        checksum_prefix_bytes = config.get('checksum_prefix_bytes', 0)
+        checksum_index_file = os.path.join(output_location, 'cache', 'checksum_index.json')
+        checksums, checksum_index = calculate_checksums_bulk(
+            (os.path.join(root, file) for root, file in all_files),
+            known=load_checksum_index(checksum_index_file, checksum_prefix_bytes),
+            max_bytes=checksum_prefix_bytes
+        )
+        save_checksum_index(checksum_index_file, checksum_index, checksum_prefix_bytes)
+        to_process = []
         for idx, (root, file) in enumerate(all_files, 1):
             file_path = os.path.join(root, file)
-            file_checksum = calculate_checksum(file_path)
+            file_checksum = checksums[file_path]
+            migrate_legacy_checksum(processed_checksums, file_path, file_checksum)
             should_process = True
             if skip_processed and file_checksum in processed_checksums:
                 last_processed_str = processed_checksums[file_checksum].get('processed_date')
@@ -175,44 +200,88 @@ def process_files(config):
                         print(f"Skipping file processed {days_since_processed} days ago: {file}")
                         should_process = False
             if should_process:
-                try:
-                    print(f"\nProcessing file {idx} / {total_files}: {file}")
-                    text = process_file(file_path, config, openai_api_key)
-                    if not text:
-                        continue
-                    record = {
-                        'file_path': file_path,
-                        'original_filename': file,
-                        'text': text,
-                        'checksum': file_checksum,
-                        'processed_date': current_datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    new_records.append(record)
-                    processed_checksums[file_checksum] = {
-                        'processed_date': current_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                        'original_file': file
-                    }
-                    save_processed_checksums(checksums_file, processed_checksums)
-                except Exception as e:
-                    logging.error(f"Error processing {file}: {str(e)}")
-                    continue
-    all_records = existing_records + new_records
-    if not all_records:
+                to_process.append((idx, file_path, file, file_checksum))
+        # Every file has had its chance to claim a legacy entry; saving the rest
+        # away now keeps later runs from hashing files twice to look for them
+        if prune_legacy_checksums(processed_checksums):
+            save_processed_checksums(checksums_file, processed_checksums)
+        # Text is extracted in parallel; results come back in file order
+        results = process_files_parallel((file_path for _, file_path, _, _ in to_process), config, openai_api_key)
+        for (idx, file_path, file, file_checksum), (text, error) in zip(to_process, results):
+            print(f"\nProcessed file {idx} / {total_files}: {file}")
+            if error is not None:
+                logging.error(f"Error processing {file}: {error}")
+                continue
+            if not text:
+                continue
+            record = {
+                'file_path': file_path,
+                'original_filename': file,
+                'text': text,
+                'checksum': file_checksum,
+                'processed_date': current_datetime.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            new_records.append(record)
+            processed_checksums[file_checksum] = {
+                'processed_date': current_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+                'original_file': file
+            }
+            append_processed_checksum(checksums_file, file_checksum, processed_checksums[file_checksum])
+    if existing_df.empty and not new_records:
         logging.warning("No records to process")
-        return [], processed_checksums, checksums_file, openai_api_key
+        return pd.DataFrame(), processed_checksums, checksums_file, openai_api_key
     if new_records:
         new_records_df = pd.DataFrame(new_records)
         processed_new_df = batch_process_medical_records(new_records_df, config, openai_api_key)
-        if existing_records:
-            existing_df = pd.DataFrame(existing_records)
+        if not existing_df.empty:
             records_df = pd.concat([existing_df, processed_new_df], ignore_index=True)
         else:
             records_df = processed_new_df
     else:
-        records_df = pd.DataFrame(existing_records)
-    return records_df.to_dict('records'), processed_checksums, checksums_file, openai_api_key
+        records_df = existing_df
+    return records_df, processed_checksums, checksums_file, openai_api_key
+
+def get_response_cache_dir(config):
+    """Directory for cached AI responses, or None when caching is disabled."""
+    if not config.get('ai_processing', {}).get('cache_responses', True):
+        return None
+    # Kept outside data_files/, which is cleared at the start of every run
+    return os.path.join(config['output_location'], 'cache', 'ai_responses')
+
+def flatten_ai_response(parsed_response: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a parsed AI analysis response to the record columns it fills."""
+    provider = parsed_response.get('provider', {})
+    patient = parsed_response.get('patient', {})
+    test_results = parsed_response.get('test_results', [])
+    if isinstance(test_results, dict):
+        test_results = [test_results]
+    return {
+        'primary_condition': parsed_response.get('primary_condition', ''),
+        'diagnoses': parsed_response.get('diagnoses', []),
+        'treatments': parsed_response.get('treatments', []),
+        'summary': parsed_response.get('summary', ''),
+        'visit_type': parsed_response.get('visit_type', ''),
+        'provider_name': provider.get('name', ''),
+        'provider_facility': provider.get('facility', ''),
+        'patient_first_name': patient.get('first_name', ''),
+        'patient_middle_name': patient.get('middle_name', ''),
+        'patient_last_name': patient.get('last_name', ''),
+        'ai_treatment_date': parsed_response.get('treatment_date', ''),
+        'medications': [
+            f"{med['name']} ({med['dosage']})" if 'dosage' in med else f"{med['name']}"
+            for med in parsed_response.get('medications', [])
+            if isinstance(med, dict) and 'name' in med
+        ],
+        'test_results': [
+            f"{test.get('name', '')}: {test.get('value', '')}"
+            + (f" - {test['interpretation']}" if 'interpretation' in test else '')
+            for test in test_results
+            if isinstance(test, dict)
+        ],
+    }
 
 def batch_process_medical_records(records_df: pd.DataFrame, config: Dict[str, Any], openai_api_key: str) -> pd.DataFrame:
+    from ai_utils import query_openai_gptX_with_schema, submit_batch
     logging.info("Starting batch_process_medical_records")
     logging.info(f"Batch processing medical records with DataFrame of size: {len(records_df)}")
     print(f"\nProcessing {len(records_df)} records through AI analysis...")
@@ -240,7 +309,7 @@ def batch_process_medical_records(records_df: pd.DataFrame, config: Dict[str, An
                 records_df[col] = [[] for _ in range(len(records_df))]
             else:
                 records_df[col] = pd.Series([default_value] * len(records_df))
-    records_df['treatment_date'] = records_df['text'].apply(find_first_date_in_text)
+    records_df['treatment_date'] = extract_first_date_series(records_df['text'])
     logging.info("Extracted treatment dates from text")
     role_prompt = config['ai_processing']['role_prompt']
     model_name = config['ai_processing']['model_name']
@@ -248,169 +317,152 @@ def batch_process_medical_records(records_df: pd.DataFrame, config: Dict[str, An
     temperature = config['ai_processing']['temperature']
     function_schema = config['ai_processing'].get('function_schema', None)
     logging.info(f"Function schema: {json.dumps(function_schema, indent=2)}")
+    response_cache_dir = get_response_cache_dir(config)
     analysis_question = "Analyze this medical record and provide structured information including a summary of the visit/examination."
-    for index, record in records_df.iterrows():
-        print(f"\nAnalyzing record {index + 1} / {len(records_df)}: {record['original_filename']}")
-        logging.debug(f"Processing record at index {index}: {record['file_path']}")
-        text = record['text']
-        file_path = record['file_path']
-        if text:
-            try:
-                print("Extracting medical information...")
+    batch_responses = {}
+    if config['ai_processing'].get('use_batch_api', False):
+        print("Submitting records to the OpenAI Batch API (this may take a while)...")
+        batch_responses = submit_batch(
+            [(index, record['text'], [analysis_question]) for index, record in records_df.iterrows() if record['text']],
+            role_prompt=role_prompt,
+            model_name=model_name,
+            api_key=openai_api_key,
+            function_schema=function_schema,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+
+    def fetch_response(index, text, file_path):
+        # Runs on a worker thread; errors are handed back and dealt with in
+        # record order below, as when the records were queried one at a time
+        try:
+            if text and str(index) in batch_responses:
+                return batch_responses[str(index)], None
+            if text:
                 logging.debug(f"Calling AI API with text: {text[:50]}...")
-                ai_response = query_openai_gptX_with_schema(
-                    text=text,
-                    questions=[analysis_question],
-                    role_prompt=role_prompt,
-                    model_name=model_name,
-                    api_key=openai_api_key,
-                    file_path=None,
-                    function_schema=function_schema,
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )
-                logging.debug(f"AI API response: {ai_response}")
-                print("Analysis complete")
-                response_text = ai_response.get(analysis_question, '{}')
-                try:
-                    parsed_response = json.loads(response_text)
-                    logging.debug(f"Parsed response: {parsed_response}")
-                    records_df.at[index, 'primary_condition'] = parsed_response.get('primary_condition', '')
-                    records_df.at[index, 'diagnoses'] = parsed_response.get('diagnoses', [])
-                    records_df.at[index, 'treatments'] = parsed_response.get('treatments', [])
-                    summary = parsed_response.get('summary', '')
-                    records_df.at[index, 'summary'] = summary
-                    records_df.at[index, 'visit_type'] = parsed_response.get('visit_type', '')
-                    provider = parsed_response.get('provider', {})
-                    records_df.at[index, 'provider_name'] = provider.get('name', '')
-                    records_df.at[index, 'provider_facility'] = provider.get('facility', '')
-                    patient = parsed_response.get('patient', {})
-                    records_df.at[index, 'patient_first_name'] = patient.get('first_name', '')
-                    records_df.at[index, 'patient_middle_name'] = patient.get('middle_name', '')
-                    records_df.at[index, 'patient_last_name'] = patient.get('last_name', '')
-                    ai_date = parsed_response.get('treatment_date', '')
-                    records_df.at[index, 'ai_treatment_date'] = ai_date
-                    if pd.isna(records_df.at[index, 'treatment_date']) and ai_date:
-                        records_df.at[index, 'treatment_date'] = ai_date
-                        logging.info(f"Using AI-extracted date: {ai_date}")
-                    medications = parsed_response.get('medications', [])
-                    med_list = []
-                    for med in medications:
-                        if isinstance(med, dict) and 'name' in med:
-                            med_info = f"{med['name']}"
-                            if 'dosage' in med:
-                                med_info += f" ({med['dosage']})"
-                            med_list.append(med_info)
-                    records_df.at[index, 'medications'] = med_list
-                    test_results = parsed_response.get('test_results', [])
-                    if isinstance(test_results, dict):
-                        test_results = [test_results]
-                    test_list = []
-                    for test in test_results:
-                        if isinstance(test, dict):
-                            test_info = f"{test.get('name', '')}: {test.get('value', '')}"
-                            if 'interpretation' in test:
-                                test_info += f" - {test['interpretation']}"
-                            test_list.append(test_info)
-                    records_df.at[index, 'test_results'] = test_list
-                    logging.debug(f"Structured data stored for index {index}")
-                except json.JSONDecodeError as e:
-                    logging.error(f"Failed to parse JSON response: {e}")
-                    for col, default_value in new_columns.items():
-                        records_df.at[index, col] = default_value
-            except Exception as e:
-                logging.error(f"Error processing text: {str(e)}")
-                raise
-        else:
-            logging.warning(f"No text found for record at index {index}, sending file to API")
+            ai_response = query_openai_gptX_with_schema(
+                text=text if text else None,
+                questions=[analysis_question],
+                role_prompt=role_prompt,
+                model_name=model_name,
+                api_key=openai_api_key,
+                file_path=None if text else file_path,
+                function_schema=function_schema,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                response_cache_dir=response_cache_dir
+            )
+            return ai_response, None
+        except Exception as e:
+            return None, e
+
+    # The API calls are network-bound, so several records are analyzed at once;
+    # responses are taken in record order as they arrive
+    executor = ThreadPoolExecutor(max_workers=max(1, config['ai_processing'].get('concurrent_records', 8)))
+    # Each record's results are collected in a dict and written back a whole
+    # column at a time at the end, rather than cell by cell
+    rows = []
+    try:
+        responses = executor.map(fetch_response, records_df.index, records_df['text'], records_df['file_path'])
+        for (index, record), (ai_response, error) in zip(records_df.iterrows(), responses):
+            row = {}
+            rows.append(row)
+            print(f"\nAnalyzing record {index + 1} / {len(records_df)}: {record['original_filename']}")
+            logging.debug(f"Processing record at index {index}: {record['file_path']}")
+            text = record['text']
+            if text:
+                print("Extracting medical information...")
+            else:
+                logging.warning(f"No text found for record at index {index}, sending file to API")
             try:
-                ai_response = query_openai_gptX_with_schema(
-                    text=None,
-                    questions=[analysis_question],
-                    role_prompt=role_prompt,
-                    model_name=model_name,
-                    api_key=openai_api_key,
-                    file_path=file_path,
-                    function_schema=function_schema,
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )
+                if error is not None:
+                    raise error
+                if text:
+                    logging.debug(f"AI API response: {ai_response}")
+                    print("Analysis complete")
                 response_text = ai_response.get(analysis_question, '{}')
                 try:
-                    parsed_response = json.loads(response_text)
+                    parsed_response = json_loads(response_text)
                     logging.debug(f"Parsed response: {parsed_response}")
-                    records_df.at[index, 'primary_condition'] = parsed_response.get('primary_condition', '')
-                    records_df.at[index, 'diagnoses'] = parsed_response.get('diagnoses', [])
-                    records_df.at[index, 'treatments'] = parsed_response.get('treatments', [])
-                    summary = parsed_response.get('summary', '')
-                    records_df.at[index, 'summary'] = summary
-                    records_df.at[index, 'visit_type'] = parsed_response.get('visit_type', '')
-                    provider = parsed_response.get('provider', {})
-                    records_df.at[index, 'provider_name'] = provider.get('name', '')
-                    records_df.at[index, 'provider_facility'] = provider.get('facility', '')
-                    patient = parsed_response.get('patient', {})
-                    records_df.at[index, 'patient_first_name'] = patient.get('first_name', '')
-                    records_df.at[index, 'patient_middle_name'] = patient.get('middle_name', '')
-                    records_df.at[index, 'patient_last_name'] = patient.get('last_name', '')
-                    ai_date = parsed_response.get('treatment_date', '')
-                    records_df.at[index, 'ai_treatment_date'] = ai_date
-                    if pd.isna(records_df.at[index, 'treatment_date']) and ai_date:
-                        records_df.at[index, 'treatment_date'] = ai_date
+                    row.update(flatten_ai_response(parsed_response))
+                    ai_date = row['ai_treatment_date']
+                    if pd.isna(record['treatment_date']) and ai_date:
+                        row['treatment_date'] = ai_date
                         logging.info(f"Using AI-extracted date: {ai_date}")
-                    medications = parsed_response.get('medications', [])
-                    med_list = []
-                    for med in medications:
-                        if isinstance(med, dict) and 'name' in med:
-                            med_info = f"{med['name']}"
-                            if 'dosage' in med:
-                                med_info += f" ({med['dosage']})"
-                            med_list.append(med_info)
-                    records_df.at[index, 'medications'] = med_list
-                    test_results = parsed_response.get('test_results', [])
-                    if isinstance(test_results, dict):
-                        test_results = [test_results]
-                    test_list = []
-                    for test in test_results:
-                        if isinstance(test, dict):
-                            test_info = f"{test.get('name', '')}: {test.get('value', '')}"
-                            if 'interpretation' in test:
-                                test_info += f" - {test['interpretation']}"
-                            test_list.append(test_info)
-                    records_df.at[index, 'test_results'] = test_list
                     logging.debug(f"Structured data stored for index {index}")
                 except json.JSONDecodeError as e:
                     logging.error(f"Failed to parse JSON response: {e}")
-                    for col, default_value in new_columns.items():
-                        records_df.at[index, col] = default_value
+                    row.update(new_columns)
             except Exception as e:
+                # A failed text record stops the run; a file sent as-is just
+                # gets empty results
+                if text:
+                    logging.error(f"Error processing text: {str(e)}")
+                    raise
                 logging.error(f"Error processing file: {str(e)}")
-                for col, default_value in new_columns.items():
-                    records_df.at[index, col] = default_value
+                row.update(new_columns)
+    finally:
+        # Stop queued requests if a record failed
+        executor.shutdown(wait=False, cancel_futures=True)
+    for col in new_columns:
+        records_df[col] = [row.get(col, value) for row, value in zip(rows, records_df[col])]
     print("\nAI analysis complete for all records")
     return records_df
 
+# Columns read for each visit in the overall summary, with defaults for missing ones
+VISIT_FIELDS = (
+    ('treatment_date', 'Unknown Date'),
+    ('visit_type', 'Unknown Visit Type'),
+    ('provider_name', 'Unknown Provider'),
+    ('diagnoses', []),
+    ('treatments', []),
+    ('medications', []),
+    ('summary', ''),
+)
+
+VISIT_TEMPLATE = """
+        Date: {}
+        Visit Type: {}
+        Provider: {}
+        Diagnoses: {}
+        Treatments: {}
+        Medications: {}
+        Summary: {}
+        """
+
+def _join_list(value):
+    return ', '.join(value) if isinstance(value, list) else value
+
+def _parse_treatment_dates(dates):
+    """Parse treatment dates for sorting, with unparseable values as NaT.
+
+    Dates from the text and the AI schema are ISO (YYYY-MM-DD); other formats
+    the AI falls back to are read day first.
+    """
+    parsed = pd.to_datetime(dates, format='ISO8601', errors='coerce')
+    retry = parsed.isna() & dates.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(dates[retry], format='mixed', dayfirst=True, errors='coerce')
+    return parsed
+
 def generate_overall_summary(records_df: pd.DataFrame, config: Dict[str, Any], openai_api_key: str) -> Dict[str, Any]:
+    from ai_utils import query_openai_gptX_with_schema
     logging.info("Generating overall medical history summary")
-    records_df = records_df.sort_values('treatment_date', ascending=True)
-    history_text = []
-    for _, record in records_df.iterrows():
-        visit_date = record.get('treatment_date', 'Unknown Date')
-        visit_type = record.get('visit_type', 'Unknown Visit Type')
-        provider = record.get('provider_name', 'Unknown Provider')
-        diagnoses = record.get('diagnoses', [])
-        treatments = record.get('treatments', [])
-        medications = record.get('medications', [])
-        summary = record.get('summary', '')
-        visit_text = f"""
-        Date: {visit_date}
-        Visit Type: {visit_type}
-        Provider: {provider}
-        Diagnoses: {', '.join(diagnoses) if isinstance(diagnoses, list) else diagnoses}
-        Treatments: {', '.join(treatments) if isinstance(treatments, list) else treatments}
-        Medications: {', '.join(medications) if isinstance(medications, list) else medications}
-        Summary: {summary}
-        """
-        history_text.append(visit_text)
+    # Sort chronologically on parsed dates rather than as strings, with
+    # unparseable dates last
+    records_df = records_df.sort_values('treatment_date', ascending=True, key=_parse_treatment_dates, na_position='last')
+    columns = [
+        records_df[col].tolist() if col in records_df.columns else [default] * len(records_df)
+        for col, default in VISIT_FIELDS
+    ]
+    history_text = [
+        VISIT_TEMPLATE.format(
+            visit_date, visit_type, provider,
+            _join_list(diagnoses), _join_list(treatments), _join_list(medications),
+            summary
+        )
+        for visit_date, visit_type, provider, diagnoses, treatments, medications, summary in zip(*columns)
+    ]
     combined_history = "\n\n".join(history_text)
     ai_config = config.get('ai_overall_summary', {})
     model_name = ai_config.get('model_name', 'gpt-4o-mini')
@@ -429,7 +481,8 @@ def generate_overall_summary(records_df: pd.DataFrame, config: Dict[str, Any], o
             file_path=None,
             function_schema=function_schema,
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            response_cache_dir=get_response_cache_dir(config)
         )
         response_text = ai_response.get(analysis_question, '{}')
         summary_data = json.loads(response_text)
@@ -444,6 +497,8 @@ def generate_overall_summary(records_df: pd.DataFrame, config: Dict[str, Any], o
 
 def main():
     setup_logging()
+    # reportlab is only needed once records are ready to be written out
+    from pdf_generator import generate_medical_records_pdf, generate_overall_summary_pdf
     try:
         logging.info("Loading configuration")
         config = load_config('config/config.yaml')
@@ -467,46 +522,60 @@ def main():
                     logging.info(f"Removed file: {path}")
 
         ensure_output_location(config)
-        records = []
+        records_df = pd.DataFrame()
         processed_checksums = {}
         checksums_file = ""
         openai_api_key = ""
         try:
-            records, processed_checksums, checksums_file, openai_api_key = process_files(config)
+            records_df, processed_checksums, checksums_file, openai_api_key = process_files(config)
         except Exception as e:
             logging.error(f"Error processing files: {str(e)}")
             raise
-        if not records:
+        if records_df.empty:
             logging.warning("No records to process")
             return
-        records_df = pd.DataFrame(records)
 
         output_location = config['output_location']
         records_dir = os.path.join(output_location, 'records')
 
+        renamed = []
         for index, record in records_df.iterrows():
             try:
                 new_filename = create_new_filename({}, record.to_dict(), config)
                 ext = os.path.splitext(record['original_filename'])[1]
                 new_filename = f"{new_filename}{ext}"
                 new_file_path = os.path.join(records_dir, new_filename)
-                shutil.copy2(record['file_path'], new_file_path)
-                logging.info(f"Copied file to: {new_file_path}")
-                records_df.at[index, 'new_filename'] = new_filename
-                records_df.at[index, 'file_path'] = new_file_path
-                if record['checksum'] in processed_checksums:
-                    processed_checksums[record['checksum']]['processed_file'] = new_filename
+                renamed.append((index, record['file_path'], new_file_path, new_filename, record['checksum']))
             except Exception as e:
                 logging.error(f"Error creating filename for record {index}: {str(e)}")
 
+        # Copies are I/O-bound, so they run on a thread pool. When several records
+        # map to the same name the last one wins, as with copying one at a time.
+        copy_sources = {new_file_path: file_path for _, file_path, new_file_path, _, _ in renamed}
+
+        def copy_record(new_file_path):
+            try:
+                shutil.copy2(copy_sources[new_file_path], new_file_path)
+                return None
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            copy_errors = dict(zip(copy_sources, executor.map(copy_record, copy_sources)))
+
+        for index, file_path, new_file_path, new_filename, checksum in renamed:
+            if copy_errors[new_file_path] is not None:
+                logging.error(f"Error creating filename for record {index}: {str(copy_errors[new_file_path])}")
+                continue
+            logging.info(f"Copied file to: {new_file_path}")
+            records_df.at[index, 'new_filename'] = new_filename
+            records_df.at[index, 'file_path'] = new_file_path
+            if checksum in processed_checksums:
+                processed_checksums[checksum]['processed_file'] = new_filename
+
         if checksums_file:
             save_processed_checksums(checksums_file, processed_checksums)
 
-        csv_df = records_df.copy()
-        for col in ['diagnoses', 'treatments', 'medications']:
-            if col in csv_df.columns:
-                csv_df[col] = csv_df[col].apply(lambda x: '; '.join(x) if isinstance(x, list) else x)
-
         overall_summary = generate_overall_summary(records_df, config, openai_api_key)
         logging.info("Generated overall patient summary")
 
@@ -543,13 +612,16 @@ def main():
         logging.info(f"Saved summary data to CSV: {summary_csv_path}")
 
         # Save main records to CSV (without summary)
-        csv_df = records_df.copy()
+        # A shallow copy is enough since the joined columns replace, rather than modify, the originals
+        csv_df = records_df.copy(deep=False)
         for col in ['diagnoses', 'treatments', 'medications']:
             if col in csv_df.columns:
-                csv_df[col] = csv_df[col].apply(lambda x: '; '.join(x) if isinstance(x, list) else x)
+                csv_df[col] = ['; '.join(x) if isinstance(x, list) else x for x in csv_df[col]]
         csv_path = os.path.join(output_location, 'data_files', 'extracted_data.csv')
         csv_df.to_csv(csv_path, index=False)
         logging.info(f"Saved data to CSV: {csv_path}")
+        if config.get('compress_outputs', False):
+            write_zstd_copy(csv_path)
 
         output_html = config.get('output_html', 'output.html')
         output_html_path = os.path.join(output_location, output_html)
@@ -558,7 +630,7 @@ def main():
         # The output_pdf is defined in config and we've generated it.
         output_pdf = config.get('output_pdf', 'medical_records_output.pdf')
         # Pass output_pdf to create_html_page to show the link
-        create_html_page(records_df.to_dict('records'), output_html_path, overall_summary, pdf_filename=output_pdf)
+        create_html_page(records_df, output_html_path, overall_summary, pdf_filename=output_pdf)
         logging.info(f"Created HTML output at: {output_html_path}")
 
         # Generate the final rollup PDF with all records
@@ -122,6 +122,24 @@ def find_earliest_date_in_text(text):
     logging.info("No valid date found in text")
     return None
 
+# Patterns for find_first_date_in_text, compiled once at import
+WORD_DATE_PATTERN = re.compile(r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}\b')
+NUMERIC_DATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\b\d{1,2}/\d{1,2}/\d{2,4}\b',  # Matches dates like dd/mm/yyyy or dd/mm/yy
+    r'\b\d{4}-\d{1,2}-\d{1,2}\b',    # Matches dates like yyyy-mm-dd
+    r'\b\d{1,2}-\d{1,2}-\d{2,4}\b',  # Matches dates like dd-mm-yyyy
+    r'\b\d{1,2}\.\d{1,2}\.\d{2,4}\b',  # Matches dates like dd.mm.yyyy
+    r'\b\d{2}/\d{2}/\d{4}\b',        # Matches dates like 24/10/2024
+    r'\b\d{2}\.\d{2}\.\d{4}\b',      # Matches dates like 24.10.2024
+    r'\b\d{2}/\d{2}/\d{2}\b',        # Matches dates like 24/10/24
+    r'\b\d{1,2}/\d{2}/\d{4}\b',      # Matches dates like 7/10/2024
+    r'\b\d{2}/\d{1,2}/\d{4}\b',      # Matches dates like 24/7/2024
+    r'\b\d{1,2}/\d{1,2}/\d{4}\b',    # Matches dates like 7/7/2024
+    r'\b\d{1,2}/\d{1,2}/\d{2}\b',    # Matches dates like 7/7/24
+    r'\b\d{2}\s*[/-]\s*\d{2}\s*[/-]\s*\d{4}\b',  # Matches dates with optional spaces
+)]
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
 def find_first_date_in_text(text):
     """Find first valid date within extracted text after 2015."""
     if not text:
@@ -132,55 +150,44 @@ def find_first_date_in_text(text):
     
     # First try to parse dates in the format "Month Day, Year"
     try:
-        # Try to find dates in the format "Month Day, Year"
-        matches = re.findall(r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}\b', text)
-        if matches:
-            logging.info(f"Found word-based date: {matches[0]}")
+        match = WORD_DATE_PATTERN.search(text)
+        if match:
+            logging.info(f"Found word-based date: {match.group()}")
             try:
-                date = parser.parse(matches[0])
+                date = parser.parse(match.group())
                 if date.year >= 2015:
                     logging.info(f"Found valid word-based date after 2015: {date}")
                     return date.strftime('%Y-%m-%d')
             except ValueError as e:
-                logging.debug(f"Failed to parse word-based date {matches[0]}: {str(e)}")
+                logging.debug(f"Failed to parse word-based date {match.group()}: {str(e)}")
     except Exception as e:
         logging.debug(f"Error parsing word-based dates: {str(e)}")
     
-    # Then try numeric patterns
-    date_patterns = [
-        r'\b\d{1,2}/\d{1,2}/\d{2,4}\b',  # Matches dates like dd/mm/yyyy or dd/mm/yy
-        r'\b\d{4}-\d{1,2}-\d{1,2}\b',    # Matches dates like yyyy-mm-dd
-        r'\b\d{1,2}-\d{1,2}-\d{2,4}\b',  # Matches dates like dd-mm-yyyy
-        r'\b\d{1,2}\.\d{1,2}\.\d{2,4}\b',  # Matches dates like dd.mm.yyyy
-        r'\b\d{2}/\d{2}/\d{4}\b',        # Matches dates like 24/10/2024
-        r'\b\d{2}\.\d{2}\.\d{4}\b',      # Matches dates like 24.10.2024
-        r'\b\d{2}/\d{2}/\d{2}\b',        # Matches dates like 24/10/24
-        r'\b\d{1,2}/\d{2}/\d{4}\b',      # Matches dates like 7/10/2024
-        r'\b\d{2}/\d{1,2}/\d{4}\b',      # Matches dates like 24/7/2024
-        r'\b\d{1,2}/\d{1,2}/\d{4}\b',    # Matches dates like 7/7/2024
-        r'\b\d{1,2}/\d{1,2}/\d{2}\b',    # Matches dates like 7/7/24
-        r'\b\d{2}\s*[/-]\s*\d{2}\s*[/-]\s*\d{4}\b',  # Matches dates with optional spaces
-    ]
-    
-    # Try each pattern and return the first valid date found after 2015
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text)
-        if matches:
-            for match in matches:
-                try:
-                    # Clean up the match by removing extra spaces
-                    match = re.sub(r'\s+', '', match)
-                    date = parser.parse(match, dayfirst=True)
-                    if date.year >= 2015:
-                        logging.info(f"Found valid date after 2015: {date}")
-                        return date.strftime('%Y-%m-%d')
-                except ValueError as e:
-                    logging.debug(f"Failed to parse date {match}: {str(e)}")
-                    continue
+    # Then try numeric patterns, returning the first valid date found after 2015
+    for pattern in NUMERIC_DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            try:
+                # Clean up the match by removing extra spaces
+                match = WHITESPACE_PATTERN.sub('', match.group())
+                date = parser.parse(match, dayfirst=True)
+                if date.year >= 2015:
+                    logging.info(f"Found valid date after 2015: {date}")
+                    return date.strftime('%Y-%m-%d')
+            except ValueError as e:
+                logging.debug(f"Failed to parse date {match}: {str(e)}")
+                continue
     
     logging.info("No valid date after 2015 found in text")
     return None
 
+def extract_first_date_series(texts):
+    """Apply find_first_date_in_text to a Series of texts.
+
+    Identical texts (e.g. re-scanned pages) are only searched once.
+    """
+    dates = {text: find_first_date_in_text(text) for text in texts.drop_duplicates()}
+    return texts.map(dates)
+
 def standardize_date(date):
     """Convert date to YYYY-MM-DD format."""
     return date.strftime('%Y-%m-%d')
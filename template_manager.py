@@ -1,37 +1,143 @@
 import os
+import re
 import json
 from string import Template
+from functools import lru_cache
+
+_STYLE_BLOCK = re.compile(r'(<style>)(.*?)(</style>)', re.S)
+_SCRIPT_BLOCK = re.compile(r'(<script>)(.*?)(</script>)', re.S)
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+def minify_css(css):
+    """Drop comments and the whitespace CSS doesn't need."""
+    css = _CSS_COMMENT.sub('', css)
+    css = ' '.join(css.split())
+    css = _CSS_PUNCTUATION.sub(r'\1', css)
+    # Spaces before ':' can be significant in selectors, spaces after it aren't
+    return css.replace(': ', ':').replace(';}', '}').strip()
+
+def minify_js(js):
+    """Drop indentation, blank lines and whole-line comments.
+
+    Line breaks are kept, so automatic semicolon insertion and string
+    contents are unaffected.
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+def minify_html(source):
+    """Minify the inline <style> and <script> blocks of a template."""
+    source = _STYLE_BLOCK.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), source)
+    return _SCRIPT_BLOCK.sub(lambda m: m.group(1) + minify_js(m.group(2)) + m.group(3), source)
+
+@lru_cache(maxsize=None)
+def load_templates(templates_dir):
+    """Load and compile all template files in a directory, once per directory.
+
+    Inline styles and scripts are minified here, once, rather than being
+    written out with their indentation and comments into every page.
+    """
+    templates = {}
+    for filename in os.listdir(templates_dir):
+        if filename.endswith('.html'):
+            template_name = filename.split('.')[0]
+            file_path = os.path.join(templates_dir, filename)
+            with open(file_path, 'r', encoding='utf-8') as f:
+                templates[template_name] = Template(minify_html(f.read()))
+    return templates
+
+class _SafeContext(dict):
+    """Leave unknown placeholders in place, like Template.safe_substitute."""
+    def __missing__(self, key):
+        return f'${key}'
+
+@lru_cache(maxsize=None)
+def format_string(template):
+    """Convert a string.Template into an equivalent str.format string.
+
+    str.format_map substitutes in C in a single pass, whereas
+    Template.safe_substitute calls back into Python for every placeholder.
+    """
+    source = template.template
+    parts = []
+    start = 0
+    for match in template.pattern.finditer(source):
+        name = match.group('named') or match.group('braced')
+        if name is not None:
+            replacement = f'{{{name}}}'
+        elif match.group('escaped') is not None:
+            replacement = '$'
+        else:
+            continue
+        parts.append(source[start:match.start()].replace('{', '{{').replace('}', '}}'))
+        parts.append(replacement)
+        start = match.end()
+    parts.append(source[start:].replace('{', '{{').replace('}', '}}'))
+    return ''.join(parts)
+
+def substitute(template, context):
+    return format_string(template).format_map(_SafeContext(context))
+
+@lru_cache(maxsize=None)
+def split_template(template, names):
+    """Split a template around the given placeholder names.
+
+    Returns ([(static_template, name), ...], tail_template). The static parts
+    are compiled once per template and set of names, not on every stream.
+    """
+    source = template.template
+    sections = []
+    start = 0
+    for match in template.pattern.finditer(source):
+        name = match.group('named') or match.group('braced')
+        if name not in names:
+            continue
+        sections.append((Template(source[start:match.start()]), name))
+        start = match.end()
+    return sections, Template(source[start:])
 
 class TemplateManager:
     def __init__(self, templates_dir, translation_manager):
         self.templates_dir = templates_dir
         self.translator = translation_manager
-        self._templates = {}
-        self._load_templates()
+        self._templates = load_templates(templates_dir)
     
-    def _load_templates(self):
-        """Load all template files from the templates directory."""
-        for filename in os.listdir(self.templates_dir):
-            if filename.endswith('.html'):
-                template_name = filename.split('.')[0]
-                file_path = os.path.join(self.templates_dir, filename)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    self._templates[template_name] = Template(f.read())
-    
-    def render(self, template_name, **kwargs):
-        """
-        Render a template with translations and additional context.
-        Usage: template_manager.render('main', records=records, summary=summary)
-        """
-        if template_name not in self._templates:
-            raise ValueError(f"Template {template_name} not found")
-        
+    def _context(self, kwargs):
         # Add translations to the context
-        context = {
+        return {
             'tr': self.translator,
             'lang': self.translator.current_language,
             'translations_json': self.translator.to_json(),
             **kwargs
         }
-        
-        return self._templates[template_name].safe_substitute(context)
+
+    def _get_template(self, template_name):
+        if template_name not in self._templates:
+            raise ValueError(f"Template {template_name} not found")
+        return self._templates[template_name]
+
+    def render(self, template_name, **kwargs):
+        """
+        Render a template with translations and additional context.
+        Usage: template_manager.render('main', records=records, summary=summary)
+        """
+        return substitute(self._get_template(template_name), self._context(kwargs))
+
+    def stream(self, template_name, file, **kwargs):
+        """
+        Render a template straight into a writable file object.
+
+        Placeholders whose value is callable are filled by calling it with the
+        file, so large sections can be written piece by piece instead of being
+        built as one string first.
+        Usage: template_manager.stream('main', f, record_columns_json=write_columns)
+        """
+        template = self._get_template(template_name)
+        context = self._context(kwargs)
+        names = frozenset(name for name, value in context.items() if callable(value))
+        sections, tail = split_template(template, names)
+        for static, name in sections:
+            file.write(substitute(static, context))
+            context[name](file)
+        file.write(substitute(tail, context))
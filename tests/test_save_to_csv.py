@@ -0,0 +1,50 @@
+import csv
+
+import pytest
+
+import document_utils
+from document_utils import CSV_FIELDS, save_to_csv
+
+
+def _read_rows(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+@pytest.mark.parametrize('use_arrow', [True, False])
+def test_save_to_csv_handles_missing_values(tmp_path, monkeypatch, use_arrow):
+    pd = pytest.importorskip('pandas')
+    if use_arrow:
+        pytest.importorskip('pyarrow')
+    else:
+        monkeypatch.setattr(document_utils, '_import_pyarrow', lambda: None)
+    records = pd.DataFrame({
+        'file_path': ['a.pdf', 'b.pdf'],
+        'original_filename': ['a.pdf', None],
+        'new_filename': ['A.pdf', 'B.pdf'],
+        'checksum': ['sha256:1', float('nan')],
+        'summary': ['Seen', float('nan')],
+        'text': [None, 'Some text'],
+        'treatment_date': ['2024-01-10', None],
+    })
+    csv_path = tmp_path / 'extracted_data.csv'
+
+    save_to_csv(records, str(csv_path))
+
+    rows = _read_rows(csv_path)
+    assert rows[0] == CSV_FIELDS
+    assert rows[1][:6] == ['a.pdf', 'a.pdf', 'A.pdf', 'sha256:1', 'Seen', '']
+    assert rows[2][:6] == ['b.pdf', '', 'B.pdf', '', 'No summary available', 'Some text']
+
+
+def test_save_to_csv_handles_missing_values_in_dicts(tmp_path):
+    records = [
+        {'file_path': 'a.pdf', 'original_filename': None, 'new_filename': 'A.pdf',
+         'checksum': float('nan'), 'text': 'Some text', 'summary': None},
+    ]
+    csv_path = tmp_path / 'extracted_data.csv'
+
+    save_to_csv(records, str(csv_path))
+
+    rows = _read_rows(csv_path)
+    assert rows[1][:6] == ['a.pdf', '', 'A.pdf', '', 'No summary available', 'Some text']
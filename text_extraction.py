@@ -1,56 +1,107 @@
+import os
+import mmap
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageOps
 import PyPDF2
 import docx
 import xlrd
-from pdf2image import convert_from_path
+from pdf2image import convert_from_bytes, convert_from_path
 import io
 import logging
+from file_utils import TXT_MMAP_THRESHOLD
 
-def extract_text_from_txt(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
-def extract_text_from_pdf(file_path):
-    text = ''
-    try:
-        logging.info(f"Attempting normal text extraction from {file_path}")
-        # First try normal text extraction
+# Files are OCRed several at a time in separate processes, so each Tesseract
+# run is kept single-threaded rather than oversubscribing the cores
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# Grey level below which a pixel counts as ink when binarizing scans for OCR
+OCR_THRESHOLD = 160
+
+# Tesseract engines kept loaded per language in this process, so the language
+# data is read once per worker rather than once per image
+_tesseract_apis = {}
+
+def ocr_image(image, lang='eng'):
+    """OCR a PIL image, with a persistent tesserocr engine when installed.
+
+    Falls back to pytesseract, which starts a tesseract process per image.
+    """
+    if tesserocr is None:
+        return pytesseract.image_to_string(image, lang=lang)
+    api = _tesseract_apis.get(lang)
+    if api is None:
+        api = _tesseract_apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+    api.SetImage(image)
+    return api.GetUTF8Text()
+
+# Each extractor takes the file path, and optionally the file's contents when
+# the caller has already read them, so the file isn't read from disk again
+
+def extract_text_from_txt(file_path, data=None):
+    if data is None:
         with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            for page_num, page in enumerate(reader.pages):
-                logging.info(f"Processing page {page_num + 1} with normal extraction")
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
-                except Exception as page_error:
-                    logging.error(f"Error extracting text from page {page_num + 1}: {str(page_error)}")
-        
-        # If we got no text, try OCR approach
-        if not text.strip():
-            logging.info(f"No text found in PDF {file_path}, attempting OCR...")
+            if os.fstat(file.fileno()).st_size >= TXT_MMAP_THRESHOLD:
+                # Decoded from the page cache, without an intermediate bytes copy
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return str(mm, 'utf-8')
+            data = file.read()
+    return data.decode('utf-8')
+
+def iter_pdf_text(file_path, data=None):
+    """Yield the text of a PDF a page at a time, as it is extracted.
+
+    Pages without a text layer fall back to OCR, one page image at a time, so
+    only a single page is held in memory. Errors are raised to the caller.
+    """
+    found_text = False
+    logging.info(f"Attempting normal text extraction from {file_path}")
+    # First try normal text extraction
+    with (io.BytesIO(data) if data is not None else open(file_path, 'rb')) as file:
+        reader = PyPDF2.PdfReader(file)
+        page_count = len(reader.pages)
+        for page_num, page in enumerate(reader.pages):
+            logging.debug("Processing page %d with normal extraction", page_num + 1)
             try:
-                # Convert PDF to images
-                logging.info("Converting PDF to images using pdf2image...")
-                images = convert_from_path(file_path)
-                logging.info(f"Successfully converted PDF to {len(images)} images")
-                
-                # Perform OCR on each image
-                for i, image in enumerate(images):
-                    logging.info(f"Processing page {i+1} with OCR")
+                page_text = page.extract_text()
+                if page_text:
+                    found_text = found_text or bool(page_text.strip())
+                    yield page_text
+            except Exception as page_error:
+                logging.error(f"Error extracting text from page {page_num + 1}: {str(page_error)}")
+    
+    # If we got no text, try OCR approach
+    if not found_text:
+        logging.info(f"No text found in PDF {file_path}, attempting OCR...")
+        try:
+            for i in range(page_count):
+                # Convert one page at a time to an image
+                if data is not None:
+                    images = convert_from_bytes(data, first_page=i + 1, last_page=i + 1)
+                else:
+                    images = convert_from_path(file_path, first_page=i + 1, last_page=i + 1)
+                logging.debug("Processing page %d with OCR", i + 1)
+                for image in images:
                     try:
-                        page_text = pytesseract.image_to_string(image)
+                        page_text = ocr_image(image)
                         if page_text and page_text.strip():
-                            logging.info(f"Successfully extracted text from page {i+1}")
-                            text += page_text.strip() + "\n"
+                            logging.debug("Successfully extracted text from page %d", i + 1)
+                            yield page_text.strip() + "\n"
                         else:
                             logging.warning(f"No text extracted from page {i+1}")
                     except Exception as ocr_page_error:
                         logging.error(f"Error during OCR on page {i+1}: {str(ocr_page_error)}")
-            except Exception as ocr_error:
-                logging.error(f"Error during OCR processing: {str(ocr_error)}")
-                raise
+        except Exception as ocr_error:
+            logging.error(f"Error during OCR processing: {str(ocr_error)}")
+            raise
+
+def extract_text_from_pdf(file_path, data=None):
+    try:
+        text = ''.join(iter_pdf_text(file_path, data))
         
         if not text.strip():
             logging.warning("No text could be extracted from the PDF using either method")
@@ -61,16 +112,27 @@ def extract_text_from_pdf(file_path):
         logging.error(f"Error processing PDF {file_path}: {str(e)}")
         return ""
 
-def extract_text_from_image(file_path, lang):
-    image = Image.open(file_path)
-    return pytesseract.image_to_string(image, lang=lang)
+def preprocess_image_for_ocr(image):
+    """Convert a scan to high-contrast black and white, which Tesseract reads more reliably."""
+    image = ImageOps.exif_transpose(image)
+    image = ImageOps.autocontrast(ImageOps.grayscale(image))
+    return image.point(lambda value: 255 if value > OCR_THRESHOLD else 0, mode='1')
+
+def extract_text_from_image(file_path, lang, data=None, preprocess=False):
+    image = Image.open(io.BytesIO(data) if data is not None else file_path)
+    if preprocess:
+        image = preprocess_image_for_ocr(image)
+    return ocr_image(image, lang)
 
-def extract_text_from_docx(file_path):
-    doc = docx.Document(file_path)
+def extract_text_from_docx(file_path, data=None):
+    doc = docx.Document(io.BytesIO(data) if data is not None else file_path)
     return '\n'.join([para.text for para in doc.paragraphs])
 
-def extract_text_from_excel(file_path):
-    workbook = xlrd.open_workbook(file_path)
+def extract_text_from_excel(file_path, data=None):
+    if data is not None:
+        workbook = xlrd.open_workbook(file_contents=data)
+    else:
+        workbook = xlrd.open_workbook(file_path)
     text = ''
     for sheet in workbook.sheets():
         for row in range(sheet.nrows):
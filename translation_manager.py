@@ -2,6 +2,7 @@ import os
 import json
 import logging
 from functools import lru_cache
+from json_utils import json_dumps
 
 class TranslationManager:
     def __init__(self, translations_dir, default_language='en'):
@@ -9,6 +10,7 @@ class TranslationManager:
         self.default_language = default_language
         self.current_language = default_language
         self._translations = {}
+        self._json_cache = {}
         self._load_translations()
     
     def _load_translations(self):
@@ -78,5 +80,10 @@ class TranslationManager:
         return self._translations.get(self.current_language, self._translations.get(self.default_language, {}))
 
     def to_json(self):
-        """Convert current language translations to JSON for client-side use."""
-        return json.dumps(self.get_all_translations())
+        """Convert current language translations to JSON for client-side use.
+
+        Encoded once per language, since every template render asks for it.
+        """
+        if self.current_language not in self._json_cache:
+            self._json_cache[self.current_language] = json_dumps(self.get_all_translations())
+        return self._json_cache[self.current_language]